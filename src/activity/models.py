@@ -1,7 +1,9 @@
 from __future__ import unicode_literals
+import collections
 
 from django.apps import apps
 from django.db import models
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
 
 
@@ -75,6 +77,48 @@ VERB_CHOICES = [
 ]
 # For filtering on the homepage.
 FILTER_CATEGORIES = set(c for c in CATEGORIES if CATEGORIES[c]['filter'])
+# What the actions/*.html templates need for each model, to avoid a query per
+# action when rendering the feed.
+PREFETCH_LOOKUPS = {
+    ('books', 'Book'): ['details__authors'],
+    ('books', 'Note'): [
+        'tags__category', 'authors', 'section__authors', 'book__details__authors',
+        'book__details__default_authors',
+    ],
+    ('books', 'Section'): ['authors'],
+    ('books', 'Tag'): ['category'],
+    ('vocab', 'TermOccurrence'): [
+        'term', 'category', 'authors', 'section__authors', 'book__details__authors',
+        'book__details__default_authors',
+    ],
+}
+
+
+def prefetch_instances(actions):
+    """Fetches the primary and secondary instances for a list of actions,
+    with one in_bulk() query per model (plus the prefetching above). Instances
+    that have since been deleted are set to None."""
+    ids_by_model = collections.defaultdict(set)
+    for action in actions:
+        for which in ('primary', 'secondary'):
+            model_key, pk = action._get_model_key_and_id(which)
+            if model_key is not None and pk is not None:
+                ids_by_model[model_key].add(pk)
+
+    instances_by_model = {}
+    for model_key, ids in ids_by_model.items():
+        model = apps.get_model(*model_key)
+        instances = model.objects.in_bulk(ids)
+        prefetch_related_objects(
+            list(instances.values()), *PREFETCH_LOOKUPS.get(model_key, [])
+        )
+        instances_by_model[model_key] = instances
+
+    for action in actions:
+        for which in ('primary', 'secondary'):
+            model_key, pk = action._get_model_key_and_id(which)
+            instance = instances_by_model.get(model_key, {}).get(pk)
+            setattr(action, '_{}_instance'.format(which), instance)
 
 
 class Action(models.Model):
@@ -87,6 +131,13 @@ class Action(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        # For the keyset pagination on the home page (see pagination.py).
+        indexes = [
+            models.Index(fields=['timestamp', 'id'],
+                         name='action_timestamp_idx'),
+            models.Index(fields=['category', 'timestamp', 'id'],
+                         name='action_category_idx'),
+        ]
 
     @property
     def display_template(self):
@@ -105,17 +156,31 @@ class Action(models.Model):
     def noun(self):
         return CATEGORIES[self.category]['noun']
 
+    def _get_model_key_and_id(self, which):
+        """which is either 'primary' or 'secondary'"""
+        model_key = CATEGORIES[self.category]['{}_model'.format(which)]
+        return model_key, getattr(self, '{}_id'.format(which))
+
+    def _get_instance(self, which):
+        """Cached, and set in bulk by prefetch_instances. None if the instance
+        no longer exists."""
+        attr = '_{}_instance'.format(which)
+        if not hasattr(self, attr):
+            instance = None
+            model_key, pk = self._get_model_key_and_id(which)
+            if model_key is not None and pk is not None:
+                model = apps.get_model(*model_key)
+                instance = model.objects.filter(pk=pk).first()
+            setattr(self, attr, instance)
+        return getattr(self, attr)
+
     @property
     def primary_instance(self):
-        app_label, model_name = CATEGORIES[self.category]['primary_model']
-        model = apps.get_model(app_label=app_label, model_name=model_name)
-        return model.objects.get(pk=self.primary_id)
+        return self._get_instance('primary')
 
     @property
     def secondary_instance(self):
-        app_label, model_name = CATEGORIES[self.category]['secondary_model']
-        model = apps.get_model(app_label=app_label, model_name=model_name)
-        return model.objects.get(pk=self.secondary_id)
+        return self._get_instance('secondary')
 
     @property
     def book_id(self):
@@ -0,0 +1,18 @@
+"""
+ASGI config for bookmarker project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Served this way, the async views (get_definition, sync_goodreads) wait on
+their upstreams without holding up a worker.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookmarker.settings")
+
+application = get_asgi_application()
@@ -0,0 +1,254 @@
+"""Per-request query counts and timings, safe to leave on in production.
+
+InstrumentationMiddleware records the number of SQL queries, the time spent
+in SQL and in template rendering, and the total latency of every request.
+The numbers are logged as one JSON object per request (to the
+bookmarker.instrumentation logger, at INFO, which is off by default), sent to the browser in a Server-Timing
+header, and aggregated per URL name for the metrics view.
+
+Template rendering is timed by TimedDjangoTemplates, a drop-in replacement
+for the DjangoTemplates backend (see TEMPLATES in settings.py).
+
+The middleware works with both sync and async views. Queries are counted by
+a wrapper that's left installed on the connections of whichever thread runs
+them, and that only does anything during a request (for async views, the
+thread the ORM uses gets the request's stats through the context that
+sync_to_async copies).
+
+QUERY_BUDGETS sets the maximum number of queries for a view: requests that
+go over are logged as warnings, and tests can use QueryBudgetMixin to assert
+that a response stayed within its budget.
+"""
+import collections
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, \
+                         sync_to_async
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, \
+                                            Template as DjangoTemplate
+
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of queries per URL name. These are fixed regardless of the
+# size of the library, so anything that goes over is most likely an N+1.
+QUERY_BUDGETS = {
+    'home': 15,
+    'view_books': 10,
+    'view_book': 20,
+    'view_terms': 12,
+    'view_section': 15,
+    'view_all_authors': 8,
+    'view_author': 20,
+    'view_all_notes': 12,
+    'view_notes': 12,
+    'view_all_terms': 8,
+    'view_tag': 15,
+    'cite_tag': 15,
+    'print_tag': 15,
+    'view_all_tags': 8,
+    'view_faves': 15,
+    'search': 30,
+    'search_json': 10,
+}
+
+_current = contextvars.ContextVar('request_stats', default=None)
+_totals = {}
+_lock = threading.Lock()
+
+
+class RequestStats:
+    def __init__(self):
+        self.url_name = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+        # Nested renders (e.g., {% include %}) are only counted once.
+        self.template_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+    def as_dict(self):
+        return {
+            'url_name': self.url_name,
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+    def get_server_timing(self):
+        return 'sql;dur={:.2f};desc="{} queries", template;dur={:.2f}, ' \
+               'total;dur={:.2f}'.format(
+                   self.sql_time * 1000, self.queries,
+                   self.template_time * 1000, self.total_time * 1000
+               )
+
+
+class Template(DjangoTemplate):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if stats.template_depth == 0:
+                stats.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return Template(template.template, self)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.record_query(execute, sql, params, many, context)
+
+
+def _install_query_wrapper():
+    for connection in connections.all():
+        if _record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_record_query)
+
+
+class InstrumentationMiddleware:
+    """Should be the first middleware, so that the total time covers the
+    others as well."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            _install_query_wrapper()
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        stats.total_time = time.perf_counter() - start
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            await sync_to_async(_install_query_wrapper)()
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        stats.total_time = time.perf_counter() - start
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        match = request.resolver_match
+        if match is not None:
+            stats.url_name = match.url_name or match.view_name
+        record(stats)
+
+        response['Server-Timing'] = stats.get_server_timing()
+        # For QueryBudgetMixin.
+        response.request_stats = stats
+        return response
+
+
+def record(stats):
+    data = stats.as_dict()
+    budget = QUERY_BUDGETS.get(stats.url_name)
+    if budget is not None and stats.queries > budget:
+        data['budget'] = budget
+        logger.warning(json.dumps(data))
+    else:
+        logger.info(json.dumps(data))
+
+    if stats.url_name is None:
+        return
+
+    with _lock:
+        totals = _totals.get(stats.url_name)
+        if totals is None:
+            totals = _totals[stats.url_name] = collections.Counter()
+        totals['requests'] += 1
+        totals['queries'] += stats.queries
+        totals['sql_time'] += stats.sql_time
+        totals['template_time'] += stats.template_time
+        totals['total_time'] += stats.total_time
+        totals['max_queries'] = max(totals['max_queries'], stats.queries)
+        totals['max_time'] = max(totals['max_time'], stats.total_time)
+
+
+def get_metrics():
+    """Returns a dict of URL name to averages and maximums since the process
+    started (for the metrics view)."""
+    metrics = {}
+    with _lock:
+        for url_name, totals in sorted(_totals.items()):
+            requests = totals['requests']
+            metrics[url_name] = {
+                'requests': requests,
+                'avg_queries': round(totals['queries'] / requests, 2),
+                'max_queries': totals['max_queries'],
+                'budget': QUERY_BUDGETS.get(url_name),
+                'avg_sql_ms': round(totals['sql_time'] * 1000 / requests, 2),
+                'avg_template_ms': round(
+                    totals['template_time'] * 1000 / requests, 2
+                ),
+                'avg_total_ms': round(
+                    totals['total_time'] * 1000 / requests, 2
+                ),
+                'max_total_ms': round(totals['max_time'] * 1000, 2),
+            }
+    return metrics
+
+
+def reset_metrics():
+    with _lock:
+        _totals.clear()
+
+
+class QueryBudgetMixin:
+    """For TestCase subclasses. The responses have to come from the test
+    client (so that they go through the middleware)."""
+    def assertWithinQueryBudget(self, response, budget=None):
+        stats = response.request_stats
+        if budget is None:
+            budget = QUERY_BUDGETS[stats.url_name]
+        self.assertLessEqual(
+            stats.queries, budget,
+            '{} made {} queries (budget: {})'.format(
+                stats.url_name, stats.queries, budget
+            )
+        )
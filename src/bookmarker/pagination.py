@@ -0,0 +1,138 @@
+"""Keyset (cursor) pagination, for long listings where Django's Paginator
+would need a COUNT(*) and an ever-growing OFFSET.
+
+Instead of a page number, each page links to the rows after its last row or
+before its first row (the "cursor", which encodes the values of the ordering
+fields for that row). So the last page costs the same as the first one, but
+we can't show the total number of pages.
+"""
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """Duck-types the parts of django.core.paginator.Page that are used by
+    the templates (see pagination.html)."""
+    is_cursor_page = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_cursor(self):
+        return self.paginator.get_cursor(self.object_list[-1])
+
+    def previous_cursor(self):
+        return self.paginator.get_cursor(self.object_list[0])
+
+
+class CursorPaginator:
+    def __init__(self, queryset, per_page, ordering):
+        """The ordering is a list of field names (with a - prefix for
+        descending order) that must uniquely identify each row, so it should
+        end with 'pk'. Every field must be available as an attribute on the
+        objects (use annotations for anything else)."""
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+        self.ordering = [
+            (field.lstrip('-'), field.startswith('-')) for field in ordering
+        ]
+
+    def get_cursor(self, obj):
+        values = []
+        for field, descending in self.ordering:
+            value = getattr(obj, field)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            values.append(value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def _decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise InvalidCursor
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor
+        return values
+
+    def _get_filter(self, values, backwards):
+        """(a, b, c) > (x, y, z), spelled out so that each field can have its
+        own direction."""
+        keyset_filter = Q()
+        for i, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition = Q(**{'{}__{}'.format(field, lookup): values[i]})
+            for j, (previous_field, _) in enumerate(self.ordering[:i]):
+                condition &= Q(**{previous_field: values[j]})
+            keyset_filter |= condition
+        return keyset_filter
+
+    def page(self, after=None, before=None):
+        """With neither cursor, returns the first page. An empty before
+        cursor returns the last page. Invalid cursors are ignored."""
+        backwards = before is not None
+        cursor = before if backwards else after
+
+        queryset = self.queryset
+        if backwards:
+            queryset = queryset.reverse()
+        if cursor:
+            try:
+                values = self._decode_cursor(cursor)
+            except InvalidCursor:
+                return self.page()
+            queryset = queryset.filter(self._get_filter(values, backwards))
+
+        # Fetch an extra row to find out if there are any more.
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if not backwards:
+            return CursorPage(object_list, self, has_next=has_more,
+                              has_previous=bool(cursor))
+
+        if cursor and not has_more:
+            # We've gone back past the start, so show a full first page.
+            return self.page()
+
+        object_list.reverse()
+        return CursorPage(object_list, self, has_next=bool(cursor),
+                          has_previous=has_more)
+
+
+def get_page(request, queryset, per_page, ordering):
+    """Reads the after/before cursors from the query string."""
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    return paginator.page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
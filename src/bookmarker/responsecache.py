@@ -0,0 +1,133 @@
+"""Caches whole responses of the public read pages, and answers conditional
+GETs for them.
+
+cache_response keys each response on the full URL, on whether the user is
+staff, logged in or a guest (the pages differ, e.g., hidden tags are only
+shown to staff), and on the data versions the page depends on (see
+books/dataversions.py). Nothing is ever deleted: an edit bumps a version, so
+the next request misses and renders the page again.
+
+Nothing is cached or served from the cache while there are messages to show.
+Pages with a CSRF token (e.g., the staff-only forms on view_book) aren't
+cached, since the token has to match the visitor's cookie, and every visitor
+without one is given a new one.
+
+conditional_response sends an ETag (from the same parts as the cache key)
+and a Last-Modified header (the latest of the data versions, which are the
+times they were bumped), so that browsers and the proxy can revalidate a page
+and get a 304 without the view being called.
+"""
+import functools
+import hashlib
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from books import dataversions
+
+
+CACHE_PREFIX = 'bookmarker:response'
+TIMEOUT = 60 * 60 * 24
+
+
+def _get_audience(user):
+    if user.is_staff:
+        return 'staff'
+    elif user.is_authenticated:
+        return 'user'
+    else:
+        return 'guest'
+
+
+def _get_digest(*parts):
+    return hashlib.sha1('\n'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+def _get_key(*parts):
+    return '{}:{}'.format(CACHE_PREFIX, _get_digest(*parts))
+
+
+def _get_versions(request, get_names, args, kwargs):
+    """Returns the versions of dataversions.GLOBAL and of the names returned
+    by get_names. They're kept on the request, since conditional_response and
+    cache_response are usually used on the same view."""
+    versions = getattr(request, '_data_versions', None)
+    if versions is None:
+        names = [dataversions.GLOBAL] + list(get_names(*args, **kwargs))
+        versions = dataversions.get_versions(names)
+        request._data_versions = versions
+    return versions
+
+
+def _has_messages(request):
+    return len(messages.get_messages(request)) > 0
+
+
+def _is_cacheable(request, response):
+    return (
+        response.status_code == 200 and
+        not response.streaming and
+        not response.cookies and
+        # Set by get_token, i.e., the page has a CSRF token (see
+        # django.middleware.csrf).
+        not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def cache_response(get_names):
+    """Decorator for views. get_names is called with the view's arguments
+    (after the request), and returns the names of the data versions the page
+    depends on, besides dataversions.GLOBAL."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method != 'GET' or _has_messages(request):
+                return view(request, *args, **kwargs)
+
+            key = _get_key(
+                request.get_full_path(),
+                _get_audience(request.user),
+                *_get_versions(request, get_names, args, kwargs)
+            )
+
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+            response = view(request, *args, **kwargs)
+            if _is_cacheable(request, response):
+                cache.set(key, response, TIMEOUT)
+            return response
+        return wrapped
+    return decorator
+
+
+def conditional_response(get_names):
+    """Decorator for views, with the same get_names as cache_response. It
+    should go above cache_response, so that a 304 doesn't even look in the
+    cache. Pages with messages to show are never answered with a 304."""
+    def get_etag(request, *args, **kwargs):
+        return _get_digest(
+            request.get_full_path(),
+            _get_audience(request.user),
+            *_get_versions(request, get_names, args, kwargs)
+        )
+
+    def get_last_modified(request, *args, **kwargs):
+        return dataversions.get_last_modified(
+            _get_versions(request, get_names, args, kwargs)
+        )
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=get_etag, last_modified_func=get_last_modified
+        )(view)
+
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if _has_messages(request):
+                return view(request, *args, **kwargs)
+            return conditional_view(request, *args, **kwargs)
+        return wrapped
+    return decorator
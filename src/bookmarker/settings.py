@@ -54,15 +54,20 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    # Always installed, since the models have search_vector fields (they're
+    # only filled in and searched on PostgreSQL, see books/fulltext.py).
+    'django.contrib.postgres',
     'rest_framework',
     'languages',
     'bookmarker',
     'vocab',
     'books',
     'activity',
+    'goodreads_cache',
 ]
 
 MIDDLEWARE = [
+    'bookmarker.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,7 +81,8 @@ ROOT_URLCONF = 'bookmarker.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, plus timing (see instrumentation.py)
+        'BACKEND': 'bookmarker.instrumentation.TimedDjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, 'templates'),
         ],
@@ -93,6 +99,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'bookmarker.wsgi.application'
+ASGI_APPLICATION = 'bookmarker.asgi.application'
 
 
 # Database
@@ -109,7 +116,6 @@ if postgres_password:
         'HOST': 'localhost',
         'PORT': '',
     }
-    INSTALLED_APPS.append('django.contrib.postgres')
 else:
     db = {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -174,6 +180,47 @@ if ENABLE_DEBUG_TOOLBAR:
         "debug_toolbar.middleware.DebugToolbarMiddleware",
     ]
 
+# Tag statistics, bibliographies, data versions and whole pages (see
+# bookmarker/responsecache.py). In production, Redis, which is shared by the
+# workers (the data versions have to be); otherwise, and in tests, a
+# per-process in-memory cache.
+redis_url = os.environ.get('REDIS_URL')
+if redis_url and 'test' not in sys.argv:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': redis_url,
+            'TIMEOUT': None,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'TIMEOUT': None,
+        },
+    }
+
+# One JSON object per request (see instrumentation.py). Only the requests over
+# their query budget (logged as warnings) are shown by default; set
+# INSTRUMENTATION_LOG_LEVEL=INFO to log every request.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'bookmarker.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('INSTRUMENTATION_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 LOGIN_URL = '/login'
 LOGOUT_URL = '/logout'
 LOGIN_REDIRECT_URL = '/'
@@ -1,8 +1,7 @@
-import re
-
 from django import template
 from django.utils.safestring import mark_safe
-import markdown
+
+from books import rendering
 
 
 register = template.Library()
@@ -10,25 +9,18 @@ register = template.Library()
 
 @register.filter
 def markdownify(text):
-    return mark_safe(
-        markdown.markdown(
-            text,
-            extensions=['nl2br'],
-            smart_emphasis=False
-        ).replace('    ', '&ensp;')
-    )
+    return mark_safe(rendering.render(text))
 
 
-OL_REGEX = re.compile('([0-9]+)\. ')
 @register.filter
 def markdownify_title(text):
     """Same as markdownify but removes the paragraph and header tags, and
     prevents ordered lists from being created."""
-    if OL_REGEX.match(text):
-        text = OL_REGEX.sub(r'\1\\. ', text)
-    output = markdown.markdown(text, smart_emphasis=False)
-    if output.startswith('<p>') and output.endswith('</p>'):
-        output = output[3:-4]
-    if output.startswith('<h1>') and output.endswith('</h1>'):
-        output = output[4:-5]
-    return mark_safe(output)
+    return mark_safe(rendering.render(text, 'title'))
+
+
+@register.filter
+def markdownify_field(instance, field):
+    """Same as markdownify on the given field, but uses the stored HTML if
+    there is one (e.g., {{ note|markdownify_field:'quote' }})."""
+    return mark_safe(rendering.get_html(instance, field))
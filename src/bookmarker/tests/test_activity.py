@@ -0,0 +1,37 @@
+from django.test import TestCase
+
+from activity.models import Action, prefetch_instances
+from books.models import Book
+
+
+class TestPrefetchInstances(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='abc', slug='abc')
+        self.note = self.book.notes.create(subject='a', quote='b')
+        Action.objects.create(category='book', verb='added', primary_id=self.book.pk)
+        Action.objects.create(
+            category='note', verb='added', primary_id=self.note.pk,
+            secondary_id=self.book.pk,
+        )
+        Action.objects.create(
+            category='note', verb='deleted', primary_id=None,
+            secondary_id=self.book.pk,
+        )
+        # The target has since been deleted
+        Action.objects.create(category='author', verb='added', primary_id=1234)
+
+    def test_prefetch(self):
+        actions = list(Action.objects.order_by('pk'))
+        prefetch_instances(actions)
+
+        # Everything should already be cached on the actions
+        with self.assertNumQueries(0):
+            self.assertEqual(actions[0].primary_instance, self.book)
+            self.assertEqual(actions[1].primary_instance, self.note)
+            self.assertEqual(actions[1].secondary_instance, self.book)
+            self.assertIsNone(actions[2].primary_instance)
+            self.assertIsNone(actions[3].primary_instance)
+
+    def test_without_prefetch(self):
+        action = Action.objects.get(category='author')
+        self.assertIsNone(action.primary_instance)
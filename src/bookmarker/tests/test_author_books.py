@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from books import author_books
+from books.models import Author, Book, BookDetails, Section
+
+
+class TestAuthorBooks(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(name='A Author', slug='author')
+        self.other = Author.objects.create(name='B Author', slug='other')
+
+        details = BookDetails.objects.create()
+        details.authors.add(self.author)
+        Book.objects.create(title='Written', slug='written', details=details)
+
+        details = BookDetails.objects.create()
+        details.default_authors.add(self.author)
+        Book.objects.create(title='Also written', slug='also', details=details)
+
+        self.collection = Book.objects.create(title='Collection',
+                                              slug='collection')
+        section = Section.objects.create(book=self.collection, title='Essay')
+        section.authors.add(self.author, self.other)
+
+    def get_titles(self, author):
+        books = author_books.get_author_books().get(author.pk, [])
+        return [book['title'] for book in books]
+
+    def test_author_books(self):
+        with self.assertNumQueries(4):
+            self.assertEqual(
+                self.get_titles(self.author),
+                ['Also written', 'Collection', 'Written'],
+            )
+        self.assertEqual(self.get_titles(self.other), ['Collection'])
+
+    def test_invalidation(self):
+        self.assertEqual(self.get_titles(self.other), ['Collection'])
+        book = Book.objects.create(title='New', slug='new')
+        Section.objects.create(book=book, title='Essay').authors.add(
+            self.other
+        )
+        self.assertEqual(self.get_titles(self.other), ['Collection', 'New'])
@@ -0,0 +1,39 @@
+import io
+import json
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from books.models import Book, Note, Section
+
+
+class TestBenchmarks(TestCase):
+    def setUp(self):
+        call_command(
+            'generate_library', books=3, publications=1, sections=4, notes=5,
+            occurrences=5, authors=5, tags=5, terms=10, actions=20,
+            stdout=io.StringIO(),
+        )
+
+    def test_generate_library(self):
+        self.assertEqual(Book.objects.count(), 4)
+        self.assertEqual(Section.objects.count(), 16)
+        self.assertEqual(Note.objects.count(), 20)
+
+        # The counters are filled in even though signals were bypassed.
+        book = Book.objects.filter(details__isnull=False).first()
+        self.assertEqual(book.num_notes, 5)
+        self.assertEqual(
+            sum(book.sections.values_list('num_notes', flat=True)),
+            book.notes.exclude(section=None).count(),
+        )
+
+    def test_run_benchmarks(self):
+        out = io.StringIO()
+        call_command('run_benchmarks', repeat=1, stdout=out,
+                     stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['library']['Book'], 4)
+        for name in ('home', 'view_all_authors', 'search:notes'):
+            self.assertEqual(results['views'][name]['status_code'], 200)
+            self.assertGreater(results['views'][name]['queries'], 0)
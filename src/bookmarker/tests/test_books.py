@@ -1,6 +1,7 @@
 from django.test import TestCase
 
-from books.models import Book, BookDetails
+from books.models import Book, BookDetails, Note, Section
+from books.outline import resolve_sections
 
 
 class TestDeletingBook(TestCase):
@@ -51,3 +52,79 @@ class TestDeletingBook(TestCase):
             BookDetails.objects.count(),
             '1 BookDetails objects should still exist after deletion'
         )
+
+
+class TestSectionNavigation(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Sections",
+            slug='sections',
+            details=BookDetails.objects.create(num_pages=100),
+        )
+        self.sections = [
+            Section.objects.create(book=self.book, title='Preface',
+                                   in_preface=True, page_number=5),
+            Section.objects.create(book=self.book, title='One',
+                                   page_number=1),
+            Section.objects.create(book=self.book, title='Two',
+                                   page_number=20),
+            Section.objects.create(book=self.book, title='Also Two',
+                                   page_number=20),
+            Section.objects.create(book=self.book, title='Three',
+                                   page_number=50),
+        ]
+
+    def test_next_and_previous(self):
+        for previous, section in zip(self.sections, self.sections[1:]):
+            self.assertEqual(previous.get_next(), section)
+            self.assertEqual(section.get_previous(), previous)
+
+        self.assertIsNone(self.sections[0].get_previous())
+        self.assertIsNone(self.sections[-1].get_next())
+
+    def test_end_page(self):
+        book = Book.objects.select_related('details').get(pk=self.book.pk)
+        sections = list(book.sections.all())
+        with self.assertNumQueries(1):
+            end_pages = [section.get_end_page() for section in sections]
+        # A section ends where the first section with a higher page number
+        # starts, regardless of in_preface.
+        self.assertEqual(end_pages, [19, 4, 49, 49, 99])
+
+
+class TestResolvingSections(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Sections",
+            slug='sections',
+            details=BookDetails.objects.create(),
+        )
+        self.preface = Section.objects.create(
+            book=self.book, title='Preface', in_preface=True, page_number=3
+        )
+        self.one = Section.objects.create(
+            book=self.book, title='One', page_number=1
+        )
+        self.two = Section.objects.create(
+            book=self.book, title='Two', page_number=20
+        )
+
+    def test_find_section_id(self):
+        outline = self.book.outline
+        self.assertIsNone(outline.find_section_id(True, 2))
+        self.assertEqual(outline.find_section_id(True, 10), self.preface.pk)
+        self.assertEqual(outline.find_section_id(False, 1), self.one.pk)
+        self.assertEqual(outline.find_section_id(False, 19), self.one.pk)
+        self.assertEqual(outline.find_section_id(False, 20), self.two.pk)
+
+    def test_resolve_sections(self):
+        right = Note.objects.create(book=self.book, page_number=25,
+                                    section=self.two)
+        wrong = Note.objects.create(book=self.book, page_number=5,
+                                    section=self.two)
+        changed = resolve_sections(self.book)
+        self.assertEqual(
+            [(note.pk, note.section_id) for note in changed[Note]],
+            [(wrong.pk, self.one.pk)],
+        )
+        self.assertNotIn(right.pk, [note.pk for note in changed[Note]])
@@ -0,0 +1,160 @@
+import io
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from books import citations
+from books.models import Author, Book, BookDetails, Section, Tag
+
+
+class TestFormatting(TestCase):
+    def test_join_author_names(self):
+        self.assertEqual(citations.join_author_names([]), '?')
+        self.assertEqual(citations.join_author_names(['A']), 'A')
+        self.assertEqual(citations.join_author_names(['A', 'B']), 'A and B')
+        self.assertEqual(
+            citations.join_author_names(['A', 'B', 'C']), 'A, B and C'
+        )
+        self.assertEqual(
+            citations.join_author_names(['A', 'B', 'C', 'D']), 'A et al'
+        )
+
+    def test_format_note_citation(self):
+        self.assertEqual(
+            citations.format_note_citation(['Wolfgang Streeck'], 2016, 12),
+            '(Streeck, 2016, p.12)',
+        )
+
+
+class TestBibliography(TestCase):
+    def setUp(self):
+        self.tag = Tag.objects.create(slug='tag')
+
+        details = BookDetails.objects.create(year=2016, publisher='Verso')
+        details.default_authors.add(
+            Author.objects.create(name='Wolfgang Streeck', slug='streeck')
+        )
+        book = Book.objects.create(title='How will capitalism end',
+                                   slug='capitalism', details=details)
+        book.notes.create(subject='Note', quote='Quote').tags.add(self.tag)
+
+        details = BookDetails.objects.create(year=2009, publisher='Ashgate',
+                                             num_pages=300)
+        collection = Book.objects.create(title='Coming to terms',
+                                         slug='terms', details=details)
+        section = Section.objects.create(
+            book=collection, title='Rational discrimination', page_number=55
+        )
+        section.authors.add(
+            Author.objects.create(name='Oscar Gandy', slug='gandy')
+        )
+        Section.objects.create(book=collection, title='Next', page_number=77)
+        collection.notes.create(
+            subject='Note', quote='Quote', section=section, page_number=60
+        ).tags.add(self.tag)
+
+    def test_build_bibliography(self):
+        with self.assertNumQueries(6):
+            bibliography = citations.build_bibliography(self.tag.notes.all())
+
+        self.assertEqual([citation for citation, url in bibliography], [
+            'Gandy, O. (2009). Rational discrimination. In ? '
+            '_Coming to terms._ Ashgate, pp. 55-76',
+            'Streeck, W. (2016). _How will capitalism end_. Verso.',
+        ])
+
+        # Same as the citations from the models.
+        self.assertEqual(
+            bibliography[0][0],
+            Section.objects.get(page_number=55).get_citation(),
+        )
+        self.assertEqual(
+            bibliography[1][0],
+            Book.objects.get(slug='capitalism').get_citation(),
+        )
+
+    def test_tag_bibliography(self):
+        self.assertEqual(len(self.tag.get_bibliography()), 2)
+        with self.assertNumQueries(0):
+            self.tag.get_bibliography()
+
+        # Editing a book refreshes the bibliography.
+        book = Book.objects.get(slug='capitalism')
+        book.title = 'Buying time'
+        book.save()
+        self.assertIn(
+            'Streeck, W. (2016). _Buying time_. Verso.',
+            [citation for citation, url in self.tag.get_bibliography()],
+        )
+
+
+class TestStoredCitations(TestCase):
+    def setUp(self):
+        self.details = BookDetails.objects.create(year=2009,
+                                                  publisher='Ashgate')
+        self.book = Book.objects.create(title='Coming to terms',
+                                        slug='terms', details=self.details)
+        self.author = Author.objects.create(name='Oscar Gandy', slug='gandy')
+        self.section = Section.objects.create(
+            book=self.book, title='Rational discrimination', page_number=55
+        )
+        self.section.authors.add(self.author)
+        self.note = self.book.notes.create(
+            subject='Note', quote='Quote', section=self.section,
+            page_number=60,
+        )
+        self.note.authors.add(self.author)
+
+    def get_citations(self):
+        return (
+            Book.objects.get(pk=self.book.pk).citation,
+            Section.objects.get(pk=self.section.pk).citation,
+            self.book.notes.get().citation,
+        )
+
+    def test_stored(self):
+        self.assertEqual(self.get_citations(), (
+            '? (2009). _Coming to terms_. Ashgate.',
+            'Gandy, O. (2009). Rational discrimination. In ? '
+            '_Coming to terms._ Ashgate, pp. 55-None',
+            '(Gandy, 2009, p.60)',
+        ))
+
+    def test_updated(self):
+        # A new section changes the end page of the previous one.
+        Section.objects.create(book=self.book, title='Next', page_number=77)
+        self.details.year = 2010
+        self.details.save()
+        self.author.name = 'Oscar H. Gandy'
+        self.author.save()
+        self.assertEqual(self.get_citations(), (
+            '? (2010). _Coming to terms_. Ashgate.',
+            'H. Gandy, O. (2010). Rational discrimination. In ? '
+            '_Coming to terms._ Ashgate, pp. 55-76',
+            '(Gandy, 2010, p.60)',
+        ))
+
+    def test_author_deleted(self):
+        self.author.delete()
+        self.assertEqual(self.get_citations(), (
+            '? (2009). _Coming to terms_. Ashgate.',
+            '? (2009). Rational discrimination. In ? '
+            '_Coming to terms._ Ashgate, pp. 55-None',
+            '(?, 2009, p.60)',
+        ))
+
+    def test_author_cleared(self):
+        # Cleared from the author's side, so there's no pk_set.
+        self.author.sections.clear()
+        self.author.notes.clear()
+        self.assertEqual(self.get_citations()[1:], (
+            '? (2009). Rational discrimination. In ? '
+            '_Coming to terms._ Ashgate, pp. 55-None',
+            '(?, 2009, p.60)',
+        ))
+
+    def test_rebuild(self):
+        Book.objects.update(citation='')
+        Section.objects.update(citation='')
+        call_command('rebuild_citations', stdout=io.StringIO())
+        self.assertEqual(self.get_citations()[1], self.section.get_citation())
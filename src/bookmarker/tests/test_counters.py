@@ -0,0 +1,78 @@
+from django.db.models.signals import post_save
+from django.test import TestCase
+
+from books import counters
+from books.models import Book, Note
+from vocab.models import Term, TermCategory, TermOccurrence
+
+
+class TestCounters(TestCase):
+    """The num_notes/num_terms counters on Book and Section are maintained by
+    signal handlers rather than computed with Count() on every page load."""
+    def setUp(self):
+        self.book = Book.objects.create(title='abc', slug='abc')
+        self.other_book = Book.objects.create(title='def', slug='def')
+        self.section = self.book.sections.create(title='One', page_number=1)
+
+    def assertCounts(self, instance, num_notes, num_terms):
+        instance.refresh_from_db()
+        self.assertEqual(instance.num_notes, num_notes, 'num_notes for {}'.format(instance))
+        self.assertEqual(instance.num_terms, num_terms, 'num_terms for {}'.format(instance))
+
+    def test_notes(self):
+        note = self.book.notes.create(subject='a', quote='b', section=self.section)
+        self.book.notes.create(subject='c', quote='d')
+        self.assertCounts(self.book, 2, 0)
+        self.assertCounts(self.section, 1, 0)
+
+        # Moving the note to a different book
+        note.book = self.other_book
+        note.section = None
+        note.save()
+        self.assertCounts(self.book, 1, 0)
+        self.assertCounts(self.section, 0, 0)
+        self.assertCounts(self.other_book, 1, 0)
+
+        note.delete()
+        self.assertCounts(self.other_book, 0, 0)
+
+    def test_terms(self):
+        category = TermCategory.objects.create(name='new', confidence=0)
+        term = Term.objects.create(text='abc', definition='def', highlights='abc')
+        TermOccurrence.objects.create(
+            term=term, book=self.book, section=self.section,
+            category=category, is_new=True, is_defined=False,
+        )
+        self.assertCounts(self.book, 0, 1)
+        self.assertCounts(self.section, 0, 1)
+
+        # Deleting the section deletes its term occurrences too
+        self.section.delete()
+        self.assertCounts(self.book, 0, 0)
+
+    def test_transactional(self):
+        # A later post_save handler fails, so the note isn't saved, and
+        # neither is the counter.
+        def fail(sender, **kwargs):
+            raise RuntimeError
+
+        post_save.connect(fail, sender=Note)
+        try:
+            with self.assertRaises(RuntimeError):
+                self.book.notes.create(subject='a', quote='b')
+        finally:
+            post_save.disconnect(fail, sender=Note)
+        self.assertFalse(Note.objects.exists())
+        self.assertCounts(self.book, 0, 0)
+
+    def test_drift(self):
+        self.book.notes.create(subject='a', quote='b', section=self.section)
+        Book.objects.filter(pk=self.book.pk).update(num_notes=5)
+        drift = counters.find_drift(Book)
+        self.assertEqual(
+            [(self.book.pk, 'num_notes', 5, 1)],
+            [(instance.pk, field, stored, actual) for instance, field, stored, actual in drift]
+        )
+        counters.fix_drift(Book, drift)
+        self.assertCounts(self.book, 1, 0)
+        self.assertEqual(counters.find_drift(Book), [])
@@ -0,0 +1,144 @@
+import collections
+import datetime
+import io
+import threading
+import time
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from merriam_webster.api import WordNotFoundException
+from vocab import api, definitions
+from vocab.models import Definition
+
+
+Entry = collections.namedtuple('Entry', ['function', 'senses'])
+
+
+class StubDictionary:
+    """Stands in for the Merriam-Webster API."""
+    def __init__(self):
+        self.lookups = []
+        self.lock = threading.Lock()
+
+    def lookup(self, term):
+        with self.lock:
+            self.lookups.append(term)
+        if term == 'slow':
+            time.sleep(0.5)
+        if term == 'flaneur':
+            return [Entry('noun', [('an idle man-about-town', [])])]
+        raise WordNotFoundException(term, ['flaneur'])
+
+
+class StubTranslator:
+    """Stands in for WordReference (translate_word)."""
+    def __init__(self):
+        self.lookups = []
+
+    def __call__(self, dictionary, term):
+        self.lookups.append((dictionary, term))
+        if term == 'flâneur':
+            return [('flâneur', 'stroller \nidler')]
+        return -1
+
+
+class DefinitionsTestCase(TestCase):
+    def setUp(self):
+        self.dictionary = StubDictionary()
+        self.translator = StubTranslator()
+        patchers = [
+            mock.patch.object(api, 'DICTIONARY', self.dictionary),
+            mock.patch.object(api, 'translate_word', self.translator),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class TestGetDefinition(DefinitionsTestCase):
+    def test_cached(self):
+        for i in range(3):
+            self.assertEqual(
+                definitions.get_definition('en', 'flaneur'),
+                '(noun) an idle man-about-town',
+            )
+        self.assertEqual(self.dictionary.lookups, ['flaneur'])
+
+    def test_other_language(self):
+        for i in range(2):
+            self.assertEqual(
+                definitions.get_definition('fr', 'flâneur'), 'stroller; idler'
+            )
+        self.assertEqual(self.translator.lookups, [('fren', 'flâneur')])
+
+    def test_not_found(self):
+        for i in range(2):
+            definitions.get_definition('en', 'flanuer')
+            definitions.get_definition('fr', 'flanuer')
+        self.assertEqual(self.dictionary.lookups, ['flanuer'])
+        self.assertEqual(len(self.translator.lookups), 1)
+        self.assertFalse(Definition.objects.filter(found=True).exists())
+
+    def test_expired(self):
+        definitions.get_definition('en', 'flanuer')
+        Definition.objects.update(
+            fetched_at=Definition.objects.get().fetched_at -
+            definitions.NOT_FOUND_TTL - datetime.timedelta(seconds=1)
+        )
+        definitions.get_definition('en', 'flanuer')
+        self.assertEqual(self.dictionary.lookups, ['flanuer', 'flanuer'])
+        self.assertEqual(Definition.objects.count(), 1)
+
+    def test_too_long(self):
+        # A whole selection, which doesn't fit in Definition.text.
+        text = 'flanuer ' * 20
+        for i in range(2):
+            definitions.get_definition('en', text)
+            response = self.client.get('/api/define.json', {'term': text})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.dictionary.lookups), 4)
+        self.assertFalse(Definition.objects.exists())
+
+    def test_view(self):
+        for i in range(2):
+            response = self.client.get('/api/define.json',
+                                       {'term': 'flaneur', 'language': 'en'})
+            self.assertEqual(
+                response.json()['definition'], '(noun) an idle man-about-town'
+            )
+        self.assertEqual(len(self.dictionary.lookups), 1)
+
+    def test_view_timeout(self):
+        with mock.patch.object(definitions, 'LOOKUP_TIMEOUT', 0.05):
+            response = self.client.get('/api/define.json', {'term': 'slow'})
+        self.assertTrue(response.json()['timed_out'])
+        self.assertIsNone(response.json()['definition'])
+        self.assertFalse(Definition.objects.exists())
+
+
+class TestPrefetch(DefinitionsTestCase):
+    def test_prefetch(self):
+        definitions.get_definition('en', 'flaneur')
+        counts = definitions.prefetch(
+            'en', ['flaneur', 'flanuer', 'flaneuse', 'flaneuse'], max_workers=2
+        )
+        self.assertEqual(counts, {
+            'cached': 1, 'found': 0, 'not_found': 2, 'failed': 0,
+        })
+        self.assertEqual(Definition.objects.count(), 3)
+
+        # Everything is cached now.
+        with self.assertNumQueries(2):
+            definitions.get_definition('en', 'flaneuse')
+            definitions.get_definition('en', 'flaneur')
+        self.assertEqual(len(self.dictionary.lookups), 3)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('prefetch_definitions', 'flaneur', 'flanuer', workers=2,
+                     stdout=out)
+        self.assertEqual(
+            out.getvalue().strip(), '0 cached, 1 found, 1 not found, 0 failed'
+        )
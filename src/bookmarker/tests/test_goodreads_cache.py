@@ -0,0 +1,127 @@
+import datetime
+import io
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from books import goodreadstools
+from books.models import Book, BookDetails, IgnoredBook
+from goodreads_cache import feeds, sync
+from goodreads_cache.models import FeedPage, ShelfSync
+
+
+EMPTY_FEED = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<rss version="2.0"><channel><title>Empty</title></channel></rss>'
+)
+
+
+def get_test_feed():
+    path = os.path.join(os.path.dirname(__file__), 'goodreads_rss.xml')
+    with open(path) as f:
+        return f.read()
+
+
+def store_page(page, content, fetched_at=None):
+    fetched_at = fetched_at or timezone.now()
+    return FeedPage.objects.create(
+        url='{}&page={}'.format(goodreadstools.READ_URL, page),
+        content=content,
+        etag='"{}"'.format(page),
+        fetched_at=fetched_at,
+        changed_at=fetched_at,
+    )
+
+
+class TestFeeds(TestCase):
+    def test_fresh_page_is_served_from_the_database(self):
+        stored = store_page(1, get_test_feed())
+        # No request is made, since the page is younger than max_age.
+        page = goodreadstools.fetch_page(1, max_age=datetime.timedelta(hours=1))
+        self.assertEqual(page, stored)
+        self.assertEqual(page.fetched_at, stored.fetched_at)
+
+    def test_session_is_shared(self):
+        self.assertIs(feeds.get_session(), feeds.get_session())
+
+
+class TestReconcile(TestCase):
+    def test_matches_parse_rss(self):
+        content = get_test_feed()
+        books = list(goodreadstools._iter_items(content))
+        self.assertEqual(
+            goodreadstools.reconcile(books), goodreadstools._parse_rss(content)
+        )
+
+    def test_num_queries(self):
+        books = list(goodreadstools._iter_items(get_test_feed()))
+        details = BookDetails.objects.create(goodreads_id=books[0]['id'])
+        Book.objects.create(title='Processed', slug='processed',
+                            details=details, is_processed=True)
+        IgnoredBook.objects.create(goodreads_id=books[1]['id'])
+        with self.assertNumQueries(3):
+            self.assertEqual(goodreadstools.reconcile(books), [])
+
+
+class TestSyncView(TestCase):
+    def test_shows_latest_sync(self):
+        books = goodreadstools._parse_rss(get_test_feed())
+        ShelfSync.objects.create(finished_at=timezone.now(), num_pages=1,
+                                 num_books=2, books=books)
+        self.client.force_login(
+            get_user_model().objects.create_user('reader')
+        )
+        response = self.client.get(reverse('sync_goodreads'))
+        self.assertContains(response, 'The Mandarins')
+        self.assertContains(response, '2 books on 1 pages')
+
+    def test_failed_sync(self):
+        books = goodreadstools._parse_rss(get_test_feed())
+        ShelfSync.objects.create(
+            started_at=timezone.now() - datetime.timedelta(days=1),
+            finished_at=timezone.now() - datetime.timedelta(days=1),
+            num_pages=1, num_books=2, books=books,
+        )
+        ShelfSync.objects.create(finished_at=timezone.now(),
+                                 error='Connection refused')
+        self.client.force_login(
+            get_user_model().objects.create_user('reader')
+        )
+        # The books of the last successful sync are still shown.
+        response = self.client.get(reverse('sync_goodreads'))
+        self.assertContains(response, 'The Mandarins')
+        self.assertContains(response, 'Connection refused')
+
+
+# The pages are fetched by other threads, which need to see the stored pages.
+class TestSync(TransactionTestCase):
+    def setUp(self):
+        content = get_test_feed()
+        # Pages 1 and 2 have the same books, which are only counted once.
+        store_page(1, content)
+        store_page(2, content)
+        store_page(3, EMPTY_FEED)
+        store_page(4, EMPTY_FEED)
+
+    def test_run_sync(self):
+        shelf_sync = sync.run_sync(
+            max_workers=2, max_age=datetime.timedelta(hours=1)
+        )
+        self.assertEqual(shelf_sync.num_pages, 2)
+        self.assertEqual(shelf_sync.num_books, 2)
+        self.assertEqual(
+            shelf_sync.books,
+            goodreadstools._parse_rss(get_test_feed()),
+        )
+        self.assertEqual(sync.get_latest(), shelf_sync)
+        self.assertFalse(sync.is_running())
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('sync_goodreads', workers=3, max_age=60, stdout=out)
+        self.assertEqual(out.getvalue().strip(), '2 pages, 2 books, 2 to sync')
+        self.assertEqual(ShelfSync.objects.count(), 1)
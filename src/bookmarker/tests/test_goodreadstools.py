@@ -1,9 +1,13 @@
 import datetime
+import io
 import os
+import unittest
 
+from django.core.management import call_command
 from django.test import TestCase
 
 from books import goodreadstools
+from books.management.commands import benchmark_rss
 
 
 class TestParseNumPages(TestCase):
@@ -84,3 +88,19 @@ class TestGetAuthorId(TestCase):
             '',
             goodreadstools._parse_id('')
         )
+
+
+class TestIterItems(TestCase):
+    def test_large_feed(self):
+        out = io.StringIO()
+        call_command('benchmark_rss', items=50, repeat=1, stdout=out,
+                     stderr=io.StringIO())
+        self.assertIn('lxml: 50 books', out.getvalue())
+
+    @unittest.skipIf(benchmark_rss.bs4 is None, 'bs4 is not installed')
+    def test_same_as_soup(self):
+        with open(benchmark_rss.DEFAULT_PATH) as f:
+            content = benchmark_rss.Command().make_feed(f.read(), 50)
+        books = list(goodreadstools._iter_items(content))
+        self.assertEqual(len(books), 50)
+        self.assertEqual(books, benchmark_rss.parse_with_soup(content))
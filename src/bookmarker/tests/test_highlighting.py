@@ -0,0 +1,30 @@
+from django.test import TestCase
+
+from vocab import highlighting
+
+
+class TestHighlighting(TestCase):
+    def test_highlight(self):
+        self.assertEqual(
+            highlighting.highlight('A self-evident truth', 'truths\nself evident'),
+            '<p>A <span class="highlight">self-evident</span> truth</p>',
+        )
+
+    def test_only_first_highlight(self):
+        self.assertEqual(
+            highlighting.highlight('Words and more words', 'word\nmore'),
+            '<p><span class="highlight">Word</span>s and more '
+            '<span class="highlight">word</span>s</p>',
+        )
+
+    def test_no_highlight(self):
+        self.assertEqual(
+            highlighting.highlight('Nothing here', 'something'),
+            '<p>Nothing here</p>',
+        )
+
+    def test_patterns_are_reused(self):
+        self.assertIs(
+            highlighting.get_patterns('a\nb'),
+            highlighting.get_patterns('a\nb'),
+        )
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from bookmarker import instrumentation
+from books.models import Author, Book, BookDetails, Section
+from vocab.models import Term
+
+
+class TestInstrumentation(instrumentation.QueryBudgetMixin, TestCase):
+    def setUp(self):
+        instrumentation.reset_metrics()
+        for i in range(5):
+            author = Author.objects.create(
+                name='Author {}'.format(i), slug='author-{}'.format(i)
+            )
+            details = BookDetails.objects.create()
+            details.authors.add(author)
+            details.default_authors.add(author)
+            book = Book.objects.create(
+                title='Book {}'.format(i),
+                slug='book-{}'.format(i),
+                details=details,
+            )
+            section = Section.objects.create(book=book, title='Section')
+            section.authors.add(author)
+
+    def test_view_all_authors(self):
+        response = self.client.get(reverse('view_all_authors'))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_view_author(self):
+        response = self.client.get(reverse('view_author', args=['author-0']))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_metrics(self):
+        stats = self.client.get(reverse('view_all_authors')).request_stats
+        self.assertGreater(stats.queries, 0)
+        self.assertGreater(stats.total_time, 0)
+        # The second one is served from the response cache.
+        self.client.get(reverse('view_all_authors'))
+
+        staff = get_user_model().objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        metrics = self.client.get(reverse('metrics')).json()
+        self.assertEqual(metrics['view_all_authors']['requests'], 2)
+        self.assertEqual(
+            metrics['view_all_authors']['max_queries'], stats.queries
+        )
+
+    def test_metrics_only_staff(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+        user = get_user_model().objects.create_user('user')
+        self.client.force_login(user)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_view(self):
+        # Goes through the async path of the middleware, with the ORM running
+        # the queries in another thread.
+        await Term.objects.acreate(text='flaneur', definition='An idler',
+                                   highlights='flaneur')
+        response = await self.async_client.get(
+            '/api/define.json', {'term': 'flaneur'}
+        )
+        self.assertEqual(response.json()['definition'], 'An idler')
+        self.assertEqual(response.request_stats.queries, 2)
+        self.assertIn('Server-Timing', response)
@@ -1,6 +1,8 @@
 from django.test import TestCase
 
-from bookmarker.templatetags.markdown_filter import markdownify
+from bookmarker.templatetags.markdown_filter import markdownify, \
+    markdownify_field
+from books.models import Book, Note
 
 
 class TestMarkdownify(TestCase):
@@ -14,3 +16,20 @@ class TestMarkdownify(TestCase):
             expected,
             markdownify(text)
         )
+
+    def test_stored_html(self):
+        book = Book.objects.create(title='Book', slug='book')
+        note = Note.objects.create(book=book, quote='Some *emphasis*')
+        self.assertEqual(note.quote_html, markdownify(note.quote))
+
+        Note.objects.filter(pk=note.pk).update(quote_html='<p>Stored</p>')
+        note = Note.objects.get(pk=note.pk)
+        self.assertEqual(markdownify_field(note, 'quote'), '<p>Stored</p>')
+
+        # Rows saved before the HTML fields existed are rendered on the fly.
+        Note.objects.filter(pk=note.pk).update(quote_html='')
+        note = Note.objects.get(pk=note.pk)
+        self.assertEqual(
+            markdownify_field(note, 'quote'),
+            '<p>Some <em>emphasis</em></p>',
+        )
@@ -0,0 +1,53 @@
+from django.test import TestCase
+
+from bookmarker.pagination import CursorPaginator
+from books.models import Book
+
+
+class TestCursorPaginator(TestCase):
+    def setUp(self):
+        for title in ('A', 'B', 'C', 'D', 'E'):
+            Book.objects.create(title=title, slug=title.lower())
+        self.paginator = CursorPaginator(
+            Book.objects.all(), 2, ['title', 'pk']
+        )
+
+    def get_titles(self, page):
+        return [book.title for book in page]
+
+    def test_forwards(self):
+        page = self.paginator.page()
+        self.assertEqual(self.get_titles(page), ['A', 'B'])
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+        page = self.paginator.page(after=page.next_cursor())
+        self.assertEqual(self.get_titles(page), ['C', 'D'])
+        self.assertTrue(page.has_previous())
+
+        page = self.paginator.page(after=page.next_cursor())
+        self.assertEqual(self.get_titles(page), ['E'])
+        self.assertFalse(page.has_next())
+
+    def test_backwards(self):
+        page = self.paginator.page(before='')
+        self.assertEqual(self.get_titles(page), ['D', 'E'])
+        self.assertTrue(page.has_previous())
+        self.assertFalse(page.has_next())
+
+        page = self.paginator.page(before=page.previous_cursor())
+        self.assertEqual(self.get_titles(page), ['B', 'C'])
+
+        # Going back past the start shows the (full) first page.
+        page = self.paginator.page(before=page.previous_cursor())
+        self.assertEqual(self.get_titles(page), ['A', 'B'])
+        self.assertFalse(page.has_previous())
+
+    def test_descending(self):
+        paginator = CursorPaginator(Book.objects.all(), 3, ['-title', 'pk'])
+        page = paginator.page(after=paginator.page().next_cursor())
+        self.assertEqual(self.get_titles(page), ['B', 'A'])
+
+    def test_invalid_cursor(self):
+        page = self.paginator.page(after='not a cursor')
+        self.assertEqual(self.get_titles(page), ['A', 'B'])
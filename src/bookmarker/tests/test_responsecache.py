@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from books.models import Book, Tag
+from vocab.models import Term
+
+
+class TestResponseCache(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='Capital', slug='capital')
+        self.url = reverse('view_book', args=['capital'])
+
+    def test_cached(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.content, response.content)
+
+    def test_new_note(self):
+        self.client.get(self.url)
+        self.book.notes.create(subject='Primitive accumulation', quote='...',
+                               page_number=873)
+        self.assertContains(self.client.get(self.url), 'Primitive accumulation')
+
+    def test_other_books_still_cached(self):
+        other = Book.objects.create(title='Grundrisse', slug='grundrisse')
+        self.client.get(self.url)
+        other.notes.create(subject='Fragment on machines', quote='...')
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_staff_and_guests(self):
+        Tag.objects.create(slug='secret', hidden=True)
+        url = reverse('view_all_tags')
+        self.assertNotContains(self.client.get(url), 'secret')
+
+        staff = get_user_model().objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertContains(self.client.get(url), 'secret')
+        self.client.logout()
+        self.assertNotContains(self.client.get(url), 'secret')
+
+    def test_messages(self):
+        term = Term.objects.create(text='reification', definition='',
+                                   highlights='reification')
+        url = reverse('view_all_tags')
+        self.client.get(url)
+
+        # Adds a message, which is shown on the next page.
+        self.client.post(reverse('flag_term', args=[term.pk]),
+                         {'action': 'unflag'})
+        self.assertContains(self.client.get(url), 'Term flag status not changed')
+        self.assertNotContains(self.client.get(url), 'Term flag status')
+
+    def test_csrf_token_not_cached(self):
+        # Staff get a form to mark the book as processed.
+        staff = get_user_model().objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        # More than the session and the user.
+        self.assertGreater(len(queries), 2)
+
+
+class TestConditionalResponse(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='Capital', slug='capital')
+        self.url = reverse('view_book', args=['capital'])
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.url)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_note(self):
+        etag = self.client.get(self.url)['ETag']
+        self.book.notes.create(subject='Primitive accumulation', quote='...',
+                               page_number=873)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Primitive accumulation')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_json(self):
+        url = reverse('search_json') + '?q=capital'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # The query is part of the ETag.
+        response = self.client.get(reverse('search_json') + '?q=grundrisse',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -2,9 +2,9 @@ import datetime
 
 from django.test import TestCase
 
-from books import searchtools
+from books import dataversions, searchtools
 from bookmarker.forms import SearchFilterForm
-from books.models import Book
+from books.models import Book, Note
 
 
 class TestGetSearchResults(TestCase):
@@ -55,4 +55,46 @@ class TestGetSearchResults(TestCase):
         self.assertEqual(results['terms'].count(), 0, '0 terms')
 
 class TestSearchWithinBook(TestCase):
-    pass
+    def setUp(self):
+        self.book = Book.objects.create(title='abc', slug='abc')
+        self.section = self.book.sections.create(title='Primitive accumulation')
+        self.book.notes.create(
+            subject='On enclosure',
+            quote='The so-called primitive accumulation',
+            page_number=5,
+        )
+
+    def test_bad_query(self):
+        self.assertRaises(searchtools.BadQueryException, searchtools.search_within_book, 'ab', self.book.pk)
+        self.assertRaises(searchtools.BadQueryException, searchtools.search_within_book, 'abc', 0)
+
+    def test_basic_query(self):
+        results = searchtools.search_within_book('primitive', self.book.pk)
+        self.assertEqual(len(results['notes']), 1, '1 note')
+        self.assertEqual(len(results['sections']), 1, '1 section')
+        self.assertEqual(len(results['terms']), 0, '0 terms')
+        self.assertEqual(results['notes'][0]['title'], 'On enclosure')
+        self.assertEqual(results['notes'][0]['description'], 'The so-called <mark>primitive</mark> accumulation')
+        self.assertEqual(results['notes'][0]['price'], 5)
+
+    def test_phrase_query(self):
+        results = searchtools.search_within_book('so-called primitive', self.book.pk)
+        self.assertEqual(len(results['notes']), 1, '1 note')
+        self.assertEqual(len(results['sections']), 0, '0 sections')
+        results = searchtools.search_within_book('called so', self.book.pk)
+        self.assertEqual(len(results['notes']), 0, 'the words have to be in order')
+
+    def test_index_invalidated_on_save(self):
+        searchtools.search_within_book('enclosure', self.book.pk)
+        self.book.notes.create(subject='More enclosure', quote='', page_number=6)
+        results = searchtools.search_within_book('enclosure', self.book.pk)
+        self.assertEqual(len(results['notes']), 2, 'the new note should be found')
+
+    def test_index_rebuilt_on_new_version(self):
+        # As if the note had been edited in another process: this process's
+        # index isn't dropped, but the book's data version is bumped.
+        searchtools.search_within_book('enclosure', self.book.pk)
+        Note.objects.update(subject='On the commons')
+        dataversions.bump([dataversions.book(self.book.slug)])
+        results = searchtools.search_within_book('commons', self.book.pk)
+        self.assertEqual(len(results['notes']), 1, 'the index should be rebuilt')
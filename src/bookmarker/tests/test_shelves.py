@@ -0,0 +1,40 @@
+from django.test import TestCase
+
+from books import shelves
+from books.models import Book, BookDetails
+
+
+class TestShelves(TestCase):
+    def setUp(self):
+        Book.objects.create(
+            title='New',
+            slug='new',
+            completed_read=True,
+            details=BookDetails.objects.create(),
+        )
+        Book.objects.create(title='Unread', slug='unread')
+        Book.objects.create(
+            title='Complete',
+            slug='complete',
+            is_processed=True,
+            completed_sections=True,
+            completed_read=True,
+        )
+
+    def test_counts(self):
+        with self.assertNumQueries(1):
+            counts = shelves.get_counts()
+        self.assertEqual(counts, {
+            'new': 1,
+            'incomplete': 0,
+            'unread': 1,
+            'publications': 2,
+            'complete': 1,
+            'ignored': 0,
+        })
+
+    def test_books(self):
+        self.assertEqual(
+            [book.title for book in shelves.get_books('publications')],
+            ['Unread', 'Complete'],
+        )
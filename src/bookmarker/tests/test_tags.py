@@ -0,0 +1,55 @@
+from django.test import TestCase
+
+from books.models import Author, Book, Tag
+
+
+class TestTagStats(TestCase):
+    def setUp(self):
+        self.tag = Tag.objects.create(slug='tag')
+        self.first = Author.objects.create(name='First', slug='first')
+        self.second = Author.objects.create(name='Second', slug='second')
+        book = Book.objects.create(title='Book', slug='book')
+        for authors in ([self.first], [self.first, self.second], []):
+            note = book.notes.create(subject='Note', quote='Quote')
+            note.authors.add(*authors)
+            note.tags.add(self.tag)
+        # Untagged notes don't count.
+        book.notes.create(subject='Note', quote='Quote').authors.add(
+            self.second
+        )
+
+    def test_get_authors(self):
+        with self.assertNumQueries(1):
+            authors = [
+                (author.name, author.num_notes)
+                for author in self.tag.get_authors()
+            ]
+        self.assertEqual(authors, [('First', 2), ('Second', 1)])
+
+    def test_stats(self):
+        stats = self.tag.get_stats()
+        self.assertEqual(stats['num_notes'], 3)
+        self.assertEqual(stats['num_books'], 1)
+        self.assertEqual(
+            [author['name'] for author in stats['authors']],
+            ['First', 'Second'],
+        )
+
+        with self.assertNumQueries(0):
+            self.tag.get_stats()
+
+        # Tagging another note refreshes the stats.
+        other_book = Book.objects.create(title='Other', slug='other')
+        other_book.notes.create(subject='Note', quote='Quote').tags.add(
+            self.tag
+        )
+        stats = self.tag.get_stats()
+        self.assertEqual(stats['num_notes'], 4)
+        self.assertEqual(stats['num_books'], 2)
+
+        # So does renaming an author.
+        self.first.name = 'Renamed'
+        self.first.save()
+        self.assertEqual(
+            self.tag.get_stats()['authors'][0]['name'], 'Renamed'
+        )
@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from books.typeahead import SubstringIndex
+
+
+class TestSubstringIndex(TestCase):
+    def setUp(self):
+        self.index = SubstringIndex([
+            ('Capital in the Twenty-First Century', 'piketty'),
+            ('Capital, Volume 1', 'marx'),
+            ('The Mandarins', 'beauvoir'),
+            ('Capitalist Realism', 'fisher'),
+        ])
+
+    def test_prefix(self):
+        self.assertEqual(
+            self.index.search('capital', 5),
+            ['marx', 'fisher', 'piketty'],
+            'Entries starting with the query should come first, shortest first'
+        )
+
+    def test_multiple_words(self):
+        self.assertEqual(self.index.search('capital in', 5), ['piketty'])
+        self.assertEqual(self.index.search('mand', 5), ['beauvoir'])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search('cap', 2)), 2)
+
+    def test_substring(self):
+        # Like icontains, so the middle of a word matches too.
+        self.assertEqual(self.index.search('pital', 5),
+                         ['marx', 'fisher', 'piketty'])
+        self.assertEqual(self.index.search('al, vol', 5), ['marx'])
+
+    def test_no_match(self):
+        # The words have to be in the same order, next to each other.
+        self.assertEqual(self.index.search('capital the', 5), [])
+        self.assertEqual(self.index.search('', 5), [])
@@ -0,0 +1,38 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from books.models import Author, Book, Section
+
+
+class TestViewAuthor(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(name='Author', slug='author')
+        self.book = Book.objects.create(title='Book', slug='book')
+        for page_number in range(8, 0, -1):
+            note = self.book.notes.create(
+                subject=str(page_number), quote='Quote',
+                page_number=page_number,
+            )
+            note.authors.add(self.author)
+
+        # Notes within the author's own sections aren't listed separately.
+        self.collection = Book.objects.create(title='Collection',
+                                              slug='collection')
+        section = Section.objects.create(book=self.collection, title='Essay')
+        section.authors.add(self.author)
+        note = self.collection.notes.create(subject='In section',
+                                            section=section)
+        note.authors.add(self.author)
+
+    def test_first_notes_per_book(self):
+        response = self.client.get(reverse('view_author', args=['author']))
+        rows = {row['book'].slug: row for row in response.context['books']}
+        self.assertEqual(
+            [note.subject for note in rows['book']['notes']],
+            ['1', '2', '3', '4', '5'],
+        )
+        self.assertEqual(rows['book']['num_notes'], 8)
+        self.assertEqual(rows['collection']['notes'], [])
+        self.assertEqual(rows['collection']['num_notes'], 0)
+        self.assertEqual(len(rows['collection']['sections']), 1)
+        self.assertEqual(response.context['num_notes'], 9)
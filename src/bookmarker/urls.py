@@ -86,6 +86,7 @@ urlpatterns = [
     re_path(r'^search$', bookmarker.views.search, name='search'),
     re_path(r'^sync$', bookmarker.views.sync_goodreads, name='sync_goodreads'),
     re_path(r'^search.json$', bookmarker.views.search_json, name='search_json'),
+    re_path(r'^metrics.json$', bookmarker.views.metrics, name='metrics'),
 ]
 
 
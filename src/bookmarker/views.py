@@ -3,28 +3,33 @@ import datetime
 import random
 import re
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import F, Q, Count, Max
-from django.db.models.functions import Lower
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.db.models import F, Q, Count, Max, Window
+from django.db.models.functions import Lower, RowNumber
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.utils.http import urlencode
 from django.utils.text import slugify
 from django.views.decorators.http import require_POST
 
-from activity.models import Action, CATEGORIES, FILTER_CATEGORIES
-from books import goodreadstools, searchtools
+from activity.models import Action, CATEGORIES, FILTER_CATEGORIES, \
+                            prefetch_instances
+from books import author_books, dataversions, goodreadstools, searchtools, \
+                  shelves, typeahead
 from books.forms import NoteForm, SectionForm, ArtefactAuthorForm, BookForm, \
                         BookDetailsForm, AuthorForm, TagForm, \
                         MultipleSectionsForm
 from books.models import Book, Author, Note, Tag, Section, \
                          BookDetails, TagCategory, GoodreadsAuthor
+from bookmarker import instrumentation, pagination, responsecache
 from bookmarker.forms import SearchFilterForm
-from vocab.api import lookup_term
+from goodreads_cache import sync
+from vocab import definitions
 from vocab.forms import TermForm, TermOccurrenceForm
 from vocab.models import Term, TermOccurrence, TermCategory
 
@@ -46,50 +51,12 @@ def home(request):
     else:
         mode = 'all'
 
-    paginator = Paginator(actions_list, 5)
-    page = request.GET.get('page')
-    try:
-        paged_actions = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        paged_actions = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        paged_actions = paginator.page(paginator.num_pages)
-
-    all_books = Book.objects.order_by(
-        'is_processed', 'completed_sections', '-pk'
-    ).annotate(
-        num_terms=Count('terms', distinct=True),
-        num_notes=Count('notes', distinct=True),
-    ).prefetch_related('details__default_authors')
-
-    books = {
-        'complete': all_books.filter(
-            is_processed=True,
-            is_ignored=False,
-        ),
-        'new': all_books.filter(
-            is_processed=False,
-            completed_sections=False,
-            completed_read=True,
-            details__isnull=False,
-        ),
-        'unread': all_books.filter(
-            completed_read=False,
-            is_ignored=False
-        ),
-        'incomplete': all_books.filter(
-            completed_sections=True,
-            is_processed=False,
-        ),
-        'ignored': all_books.filter(
-            is_ignored=True,
-        ),
-        'publications': all_books.filter(
-            details__isnull=True
-        ),
-    }
+    paged_actions = pagination.get_page(
+        request, actions_list, 5, ['-timestamp', '-pk']
+    )
+
+    # Fetch everything the action templates need in a fixed number of queries.
+    prefetch_instances(paged_actions.object_list)
 
     # Hide the book info for actions that have the same book as the preceding
     # action.
@@ -106,7 +73,7 @@ def home(request):
     ]
     context = {
         'qs': '?' + urlencode({'mode': mode}),
-        'books': books,
+        'shelf_counts': shelves.get_counts(),
         'actions': actions,
         'paged_actions': paged_actions,
         'mode': mode,
@@ -116,50 +83,14 @@ def home(request):
 
 
 def view_books(request, book_type):
-    all_books = Book.objects.order_by(
-        'is_processed', 'completed_sections', '-pk'
-    ).annotate(
-        num_terms=Count('terms', distinct=True),
-        num_notes=Count('notes', distinct=True),
-    ).prefetch_related('details__authors', 'details__goals')
-
-    books = {
-        'new': all_books.filter(
-            is_processed=False,
-            completed_sections=False,
-            completed_read=True,
-            details__isnull=False,
-        ).order_by('-details__end_date'),
-        'incomplete': all_books.filter(
-            completed_sections=True,
-            is_processed=False,
-        ),
-        'unread': all_books.filter(
-            completed_read=False,
-            is_ignored=False
-        ).order_by(
-            F('details__due_date').asc(nulls_last=True),
-            F('details__priority').asc(nulls_last=True)
-        ),
-        'publications': all_books.filter(
-            details__isnull=True
-        ),
-        'complete': all_books.filter(
-            is_processed=True,
-            is_ignored=False,
-        ),
-        'ignored': all_books.filter(
-            is_ignored=True,
-        ),
-    }
-    if book_type not in books:
+    if book_type not in shelves.SHELVES:
         book_type = 'complete'
         messages.warning(request, 'Invalid book type - showing completed')
 
     context = {
-        'books': books,
+        'shelf_counts': shelves.get_counts(),
         'book_type': book_type,
-        'displayed_books': books[book_type],
+        'displayed_books': shelves.get_books(book_type),
     }
     return render(request, 'view_books.html', context)
 
@@ -181,6 +112,8 @@ def print_tag(request, slug):
     return render(request, 'print_tag.html', context)
 
 
+@responsecache.conditional_response(lambda slug: [dataversions.book(slug)])
+@responsecache.cache_response(lambda slug: [dataversions.book(slug)])
 def view_book(request, slug):
     book = get_object_or_404(Book, slug=slug)
 
@@ -191,16 +124,12 @@ def view_book(request, slug):
 
     sections = book.sections.all().prefetch_related(
         'authors', 'book__details__default_authors'
-    ).annotate(
-        num_terms=Count('terms', distinct=True),
-        num_notes=Count('notes', distinct=True),
     )
 
     # If it's a publication, order the articles alphabetically by name.
     if book.details is None:
         sections = sections.order_by('title')
     else:
-        # We have to order again (repeating the default ordering) because it gets lost after calling annotate().
         sections = sections.order_by('-in_preface', 'page_number')
 
     context = {
@@ -273,16 +202,9 @@ def view_terms(request, slug):
     if author:
         terms = terms.filter(authors=author)
 
-    paginator = Paginator(terms, 10)
-    page = request.GET.get('page')
-    try:
-        terms = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        terms = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        terms = paginator.page(paginator.num_pages)
+    terms = pagination.get_page(
+        request, terms, 10, ['-in_preface', 'page_number', 'pk']
+    )
 
     context = {
         'book': book,
@@ -732,18 +654,20 @@ def add_book(request):
 def suggest_terms(request):
     term = request.GET.get('term')
 
-    # Find terms of all languages that start with these characters.
+    # Find terms of all languages matching these characters.
+    terms = []
     if term and len(term) >= 3:
-        terms = Term.objects.filter(text__icontains=term).values(
-            'text', 'language'
-        )
+        terms = typeahead.suggest('terms', term)
 
     return JsonResponse({
-        'terms': list(terms)[:5],
+        'terms': terms,
     })
 
 
-def get_definition(request):
+async def get_definition(request):
+    # Async, so that waiting on the dictionary doesn't tie up a worker. That
+    # needs ASGI (see DEPLOYMENT.md): under WSGI, the response still waits for
+    # the lookup's thread after a timeout.
     term = request.GET.get('term', '')
     language = request.GET.get('language', 'en')
 
@@ -751,11 +675,13 @@ def get_definition(request):
     definition = None
     highlights = None
     num_occurrences = 0
+    timed_out = False
 
     if term and language:
         # Check if the term already exists.
         try:
-            existing_term = Term.objects.get(text=term, language=language)
+            existing_term = await Term.objects.aget(text=term,
+                                                    language=language)
         except Term.DoesNotExist:
             existing_term = None
 
@@ -763,9 +689,12 @@ def get_definition(request):
             definition = existing_term.definition
             view_link = reverse('view_term', args=[existing_term.pk])
             highlights = existing_term.highlights
-            num_occurrences = existing_term.occurrences.count()
+            num_occurrences = await existing_term.occurrences.acount()
         else:
-            definition = lookup_term(language, term)
+            try:
+                definition = await definitions.aget_definition(language, term)
+            except TimeoutError:
+                timed_out = True
             highlights = term.lower().replace('-', ' ')
 
     return JsonResponse({
@@ -775,6 +704,7 @@ def get_definition(request):
         'highlights': highlights,
         'view_link': view_link,
         'num_occurrences': num_occurrences,
+        'timed_out': timed_out,
     })
 
 
@@ -842,38 +772,13 @@ def add_note(request, slug):
     return render(request, 'add_note.html', context)
 
 
+@responsecache.cache_response(lambda: [])
 def view_all_authors(request):
-    authors = Author.objects.prefetch_related('sections', 'books', 'default_books')
-    book_values_list = Book.objects.values_list('id', 'title', 'slug', 'details_id')
-    book_data = {}
-    details_ids = {}
-    for book_id, book_title, book_slug, details_id in book_values_list:
-        book_data[book_id] = {
-            'title': book_title,
-            'url': reverse('view_book', args=[book_slug]),
-        }
-        details_ids[details_id] = book_id
-
-    authors_and_books = []
-    for author in authors:
-        # This is hacky (it should really be a method on the model) but
-        # necessary for performance, as otherwise Django creates n queries
-        # despite the use of prefetch_related. Hence the workaround with
-        # details_ids, which helps avoid further lookups in this for loop.
-        book_ids = set()
-        for section in author.sections.all():
-            book_ids.add(section.book_id)
-        for details in author.books.all():
-            book_id = details_ids.get(details.id)
-            if book_id:
-                book_ids.add(book_id)
-        for details in author.default_books.all():
-            book_id = details_ids.get(details.id)
-            if book_id:
-                book_ids.add(book_id)
-
-        author_books = [book_data[book_id] for book_id in book_ids]
-        authors_and_books.append((author, author_books))
+    books_by_author = author_books.get_author_books()
+    authors_and_books = [
+        (author, books_by_author.get(author.pk, []))
+        for author in Author.objects.only('name', 'slug')
+    ]
 
     context = {
         'authors_and_books': authors_and_books,
@@ -885,7 +790,7 @@ def view_all_authors(request):
 def view_all_notes(request):
     notes = Note.objects.select_related('book').prefetch_related(
         'authors', 'tags', 'section', 'section__authors', 'book__details__default_authors'
-    ).order_by('book', 'added')
+    )
 
     # Build the query string dict here
     qs_dict = {}
@@ -909,16 +814,10 @@ def view_all_notes(request):
         notes = notes.filter(authors=author)
         qs_dict['author'] = author_pk
 
-    paginator = Paginator(notes, 10)
-    page = request.GET.get('page')
-    try:
-        notes = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        notes = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        notes = paginator.page(paginator.num_pages)
+    # Grouped by book (but not ordered by title, so the index can be used).
+    notes = pagination.get_page(
+        request, notes, 10, ['book_id', 'added', 'pk']
+    )
 
     context = {
         'notes': notes,
@@ -948,16 +847,9 @@ def view_notes(request, slug):
     else:
         qs = ''
 
-    paginator = Paginator(notes, 10)
-    page = request.GET.get('page')
-    try:
-        notes = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        notes = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        notes = paginator.page(paginator.num_pages)
+    notes = pagination.get_page(
+        request, notes, 10, ['-in_preface', 'page_number', 'pk']
+    )
 
     context = {
         'book': book,
@@ -969,6 +861,7 @@ def view_notes(request, slug):
     return render(request, 'view_notes.html', context)
 
 
+@responsecache.conditional_response(lambda note_id: [dataversions.NOTES])
 def view_note(request, note_id):
     note = get_object_or_404(Note, pk=note_id)
     book = note.book
@@ -1063,81 +956,84 @@ def section_redirect(request, slug):
     return redirect(section)
 
 
+NUM_ARTEFACTS_PER_BOOK = 5
+
+
+def get_first_per_book(artefacts, limit):
+    """Returns a dict of book ID to a list of the book's first [limit] notes
+    or terms (in page order), using a single ROW_NUMBER() query rather than
+    fetching every artefact and slicing in Python."""
+    artefacts = artefacts.annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=[F('book_id')],
+            order_by=[F('in_preface').desc(), F('page_number').asc(),
+                      F('pk').asc()],
+        )
+    ).filter(row_number__lte=limit).order_by('book_id', 'row_number')
+
+    artefacts_by_book = collections.defaultdict(list)
+    for artefact in artefacts:
+        artefacts_by_book[artefact.book_id].append(artefact)
+    return artefacts_by_book
+
+
+def get_count_per_book(artefacts):
+    counts = artefacts.order_by().values('book_id').annotate(
+        count=Count('pk')
+    )
+    return {row['book_id']: row['count'] for row in counts}
+
+
 def view_author(request, slug):
     author = get_object_or_404(Author, slug=slug)
-    author_section_ids = set()
-    book_ids = set()
-
-    # Find the author's direct books.
-    for details in author.books.all().select_related('book'):
-        if details.book:
-            book_ids.add(details.book.pk)
-    for details in author.default_books.all().select_related('book'):
-        if details.book:
-            book_ids.add(details.book.pk)
 
     # Find all the books for which the author has some sections.
     sections_by_book = collections.defaultdict(list)
-    sections = author.sections.all().annotate(
-        num_terms=Count('terms', distinct=True),
-        num_notes=Count('notes', distinct=True),
-    ).prefetch_related(
+    sections = author.sections.all().prefetch_related(
         'authors', 'book__details__default_authors',  'related_to__terms',
         'related_to__notes',
     ).select_related('related_to', 'related_to__book',)
     for section in sections:
-        book_id = section.book_id
-        book_ids.add(book_id)
-
-        sections_by_book[book_id].append(section)
-        author_section_ids.add(section.pk)
+        sections_by_book[section.book_id].append(section)
+    author_section_ids = set(section.pk for section in sections)
 
     # Find books for which the author is not listed as an author but has
-    # associated terms or notes.
-    notes_by_book = collections.defaultdict(list)
-    for note in author.notes.all():
-        book_id = note.book_id
-
-        section_id = note.section_id
-        if section_id:
-            if section_id in author_section_ids:
-                continue
-
-        book_ids.add(book_id)
-
-        notes_by_book[book_id].append(note)
-
-    terms_by_book = collections.defaultdict(list)
-    for term in author.terms.all().prefetch_related('category', 'term'):
-        book_id = term.book_id
-
-        section_id = term.section_id
-        if section_id:
-            if section_id in author_section_ids:
-                continue
-
-        book_ids.add(book_id)
-
-        terms_by_book[book_id].append(term)
+    # associated terms or notes (outside of the author's sections). Only the
+    # first few per book are fetched, along with the number per book.
+    notes = author.notes.exclude(section__in=author_section_ids)
+    notes_by_book = get_first_per_book(notes, NUM_ARTEFACTS_PER_BOOK)
+    num_notes_by_book = get_count_per_book(notes)
+
+    terms = author.terms.exclude(section__in=author_section_ids)
+    terms_by_book = get_first_per_book(
+        terms.prefetch_related('category', 'term'), NUM_ARTEFACTS_PER_BOOK
+    )
+    num_terms_by_book = get_count_per_book(terms)
 
-    books_query = Book.objects.filter(pk__in=book_ids).prefetch_related(
-        'details__default_authors'
+    book_ids = (
+        set(sections_by_book) | set(num_notes_by_book) |
+        set(num_terms_by_book)
+    )
+    # Also include the author's direct books.
+    books_query = Book.objects.filter(
+        Q(pk__in=book_ids) |
+        Q(details__authors=author) |
+        Q(details__default_authors=author)
+    ).distinct().prefetch_related(
+        'details__authors', 'details__default_authors'
     )
 
     books = []
     for book in books_query:
         # Only show notes if there are no sections.
-        book_sections = sections_by_book[book.id]
-        book_notes = notes_by_book[book.id]
-        book_terms = terms_by_book[book.id]
-
         books.append({
             'book': book,
-            'sections': book_sections,
-            'notes': book_notes[:5],
-            'terms': book_terms[:5],
-            'num_notes': len(book_notes),
-            'num_terms': len(book_terms),
+            'sections': sections_by_book[book.id],
+            'notes': notes_by_book[book.id],
+            'terms': terms_by_book[book.id],
+            'num_notes': num_notes_by_book.get(book.id, 0),
+            'num_terms': num_terms_by_book.get(book.id, 0),
         })
 
     context = {
@@ -1151,7 +1047,7 @@ def view_author(request, slug):
 
 
 def view_all_terms(request):
-    terms = Term.objects.order_by(Lower('text'))
+    terms = Term.objects.annotate(lower_text=Lower('text'))
 
     author_pk = request.GET.get('author')
     author = None
@@ -1183,16 +1079,7 @@ def view_all_terms(request):
             occurrences__category=notable_category,
         )
 
-    paginator = Paginator(terms, 25)
-    page = request.GET.get('page')
-    try:
-        terms = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        terms = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        terms = paginator.page(paginator.num_pages)
+    terms = pagination.get_page(request, terms, 25, ['lower_text', 'pk'])
 
     # kinda ugly ... ought to standardize this somehow
     mode_qs = '?' + urlencode({'mode': mode})
@@ -1303,11 +1190,16 @@ def edit_section(request, section_id):
     return render(request, 'edit_section.html', context)
 
 
+@responsecache.conditional_response(
+    lambda section_id: [dataversions.section(section_id)]
+)
+@responsecache.cache_response(
+    lambda section_id: [dataversions.section(section_id)]
+)
 def view_section(request, section_id):
     section = get_object_or_404(Section, pk=section_id)
 
     # Find the previous and next sections (if any) for this book.
-    # TODO: Is there a better way to do this? get_next_by is only for DateField
 
     context = {
         'book': section.book,
@@ -1319,14 +1211,17 @@ def view_section(request, section_id):
     return render(request, 'view_section.html', context)
 
 
+@responsecache.conditional_response(
+    lambda book_id: [dataversions.NOTES, dataversions.TERMS]
+)
 def within_book_search_json(request, book_id):
     """Suggest notes/sections/terms with that keyword"""
     query = request.GET.get('q')
-    
+
     try:
         results = searchtools.search_within_book(query, book_id)
     except searchtools.BadQueryException:
-        return
+        results = {'notes': [], 'terms': [], 'sections': []}
 
     return JsonResponse({
         'results': {
@@ -1346,28 +1241,17 @@ def within_book_search_json(request, book_id):
     })
 
 
+@responsecache.conditional_response(lambda: [])
 def search_json(request):
     """Suggest authors/books/sections with that name"""
-    query = request.GET.get('q')
+    query = request.GET.get('q', '')
     books = []
     authors = []
     sections = []
     if len(query) >= 3:
-        for book in Book.objects.filter(title__icontains=query):
-            books.append({
-                'title': book.title,
-                'url': book.get_absolute_url(),
-            })
-        for author in Author.objects.filter(name__icontains=query):
-            authors.append({
-                'title': author.name,
-                'url': author.get_absolute_url(),
-            })
-        for section in Section.objects.filter(title__icontains=query):
-            sections.append({
-                'title': section.title,
-                'url': section.get_absolute_url(),
-            })
+        books = typeahead.suggest('books', query)
+        authors = typeahead.suggest('authors', query)
+        sections = typeahead.suggest('sections', query)
 
     return JsonResponse({
         'results': {
@@ -1554,22 +1438,17 @@ def cite_tag(request, slug):
     return render(request, 'cite_tag.html', context)
 
 
+@responsecache.conditional_response(lambda slug: [dataversions.tag(slug)])
+@responsecache.cache_response(lambda slug: [dataversions.tag(slug)])
 def view_tag(request, slug):
     tag = get_object_or_404(Tag, slug=slug)
 
     notes = tag.notes.prefetch_related(
         'authors', 'section__authors', 'tags', 'book', 'book__details__default_authors',
-    ).order_by('book', 'page_number')
-    paginator = Paginator(notes, 10)
-    page = request.GET.get('page')
-    try:
-        notes = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        notes = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        notes = paginator.page(paginator.num_pages)
+    ).annotate(book_title=F('book__title'))
+    notes = pagination.get_page(
+        request, notes, 10, ['book_title', 'book_id', 'page_number', 'pk']
+    )
 
     context = {
         'tag': tag,
@@ -1579,6 +1458,7 @@ def view_tag(request, slug):
     return render(request, 'view_tag.html', context)
 
 
+@responsecache.cache_response(lambda: [dataversions.NOTES])
 def view_all_tags(request):
     tags = Tag.objects.all().prefetch_related('category').annotate(
         num_notes=Count('notes', distinct=True),
@@ -1608,21 +1488,31 @@ def view_faves(request):
     )
     chapters_books = set(chapters.values_list('book', flat=True))
 
-    # Randomly choose a note from the above tags/articles/chapters.
-    note_ids = set(tags.values_list('notes__id', flat=True))
-    note_ids |= set(articles.values_list('notes__id', flat=True))
-    note_ids |= set(chapters.values_list('notes__id', flat=True))
-    random_note = Note.objects.get(pk=random.choice(list(note_ids)))
-
-    # Randomly choose a term occurrence (with a non-empty quote) for a flagged term.
-    occurrence_ids = TermOccurrence.objects.filter(
-        term__flagged=True,
-    ).exclude(
-        quote='',
-    ).values_list(
-        'pk',
-        flat=True
+    # The page is different every time, so only the candidates for the
+    # random note and term occurrence are cached.
+    def get_candidates():
+        # Notes from the above tags/articles/chapters.
+        note_ids = set(tags.values_list('notes__id', flat=True))
+        note_ids |= set(articles.values_list('notes__id', flat=True))
+        note_ids |= set(chapters.values_list('notes__id', flat=True))
+        # Term occurrences (with a non-empty quote) for flagged terms.
+        occurrence_ids = TermOccurrence.objects.filter(
+            term__flagged=True,
+        ).exclude(
+            quote='',
+        ).values_list(
+            'pk',
+            flat=True
+        )
+        return list(note_ids), list(occurrence_ids)
+
+    note_ids, occurrence_ids = dataversions.get_or_set(
+        'bookmarker:fave_candidates:{}'.format(min_rating),
+        [dataversions.GLOBAL, dataversions.NOTES, dataversions.TERMS],
+        get_candidates,
+        responsecache.TIMEOUT,
     )
+    random_note = Note.objects.get(pk=random.choice(note_ids))
     random_vocab = TermOccurrence.objects.get(pk=random.choice(occurrence_ids))
 
     # Also include any books that are not covered by the sections.
@@ -1667,23 +1557,43 @@ def add_tag(request):
     return render(request, 'add_tag.html', context)
 
 
+SYNC_BOOKS_PER_PAGE = 100
+
+
 @login_required
-def sync_goodreads(request):
-    # Scrape the goodreads website and show the results (paginated)
+async def sync_goodreads(request):
+    # Show the results of the latest sync of the whole shelf (paginated). The
+    # sync itself runs in the background (see goodreads_cache/sync.py).
+    if request.method == 'POST':
+        if await sync_to_async(sync.start_in_background)():
+            messages.success(request, 'Started syncing the Goodreads shelf')
+        else:
+            messages.warning(request, 'A sync is already running')
+        return redirect('sync_goodreads')
+
     try:
         page = int(request.GET.get('page', 1))
     except ValueError:
         page = 1
 
-    books = goodreadstools.get_books(page)
+    shelf_sync = await sync.aget_latest()
+    books = shelf_sync.books if shelf_sync else []
+    paginator = Paginator(books, SYNC_BOOKS_PER_PAGE)
+    if page not in paginator.page_range:
+        page = 1
+
     context = {
-        'books': books,
+        'books': paginator.page(page).object_list,
+        'shelf_sync': shelf_sync,
+        'failed_sync': await sync.aget_latest_failure(shelf_sync),
+        'is_running': await sync.ais_running(),
         'page': page,
         'previous_page': page - 1,
-        'next_page': page + 1,
+        'next_page': page + 1 if page < paginator.num_pages else 0,
     }
 
-    return render(request, 'sync_goodreads.html', context)
+    # The context processors (e.g., for the user) can query the database.
+    return await sync_to_async(render)(request, 'sync_goodreads.html', context)
 
 
 @login_required
@@ -1700,3 +1610,13 @@ def manage_data(request):
         'books': books,
     }
     return render(request, 'manage_data.html', context)
+
+
+def metrics(request):
+    """Per-view query counts and timings for this process (see
+    instrumentation.py). Only available to staff (behind nginx, REMOTE_ADDR
+    is empty, so it can't be limited to INTERNAL_IPS)."""
+    if not request.user.is_staff:
+        raise Http404
+
+    return JsonResponse(instrumentation.get_metrics())
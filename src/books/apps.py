@@ -1,10 +1,15 @@
 from __future__ import unicode_literals
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class BooksConfig(AppConfig):
     name = 'books'
 
     def ready(self):
+        from books import fulltext, typeahead
         from books.signal_handlers import delete_related_book_details
+
+        post_migrate.connect(fulltext.create_search_indexes, sender=self)
+        post_migrate.connect(typeahead.create_trigram_indexes, sender=self)
@@ -0,0 +1,61 @@
+"""The map from each author to the books they've written (as a book author,
+a default author, or the author of some section), for view_all_authors.
+
+It's computed from the M2M through tables with values_list, so no Section or
+BookDetails instances are created, and kept in the shared cache until the
+signal handlers invalidate it.
+"""
+from django.core.cache import cache
+from django.urls import reverse
+
+from books.models import Book, BookDetails, Section
+
+
+CACHE_KEY = 'books:author_books'
+
+
+def _get_author_books():
+    book_ids_by_author = {}
+    pairs = (
+        Section.authors.through.objects.values_list(
+            'author_id', 'section__book'
+        ),
+        BookDetails.authors.through.objects.values_list(
+            'author_id', 'bookdetails__book'
+        ),
+        BookDetails.default_authors.through.objects.values_list(
+            'author_id', 'bookdetails__book'
+        ),
+    )
+    for queryset in pairs:
+        for author_id, book_id in queryset.iterator():
+            if book_id is not None:
+                book_ids_by_author.setdefault(author_id, set()).add(book_id)
+
+    books = {
+        book_id: {
+            'title': title,
+            'url': reverse('view_book', args=[slug]),
+        }
+        for book_id, title, slug in Book.objects.values_list(
+            'id', 'title', 'slug'
+        ).iterator()
+    }
+
+    return {
+        author_id: sorted(
+            (books[book_id] for book_id in book_ids if book_id in books),
+            key=lambda book: book['title'],
+        )
+        for author_id, book_ids in book_ids_by_author.items()
+    }
+
+
+def get_author_books():
+    """Returns a dict of author pk to a list of {'title', 'url'} dicts, sorted
+    by title. Authors without any books are left out."""
+    return cache.get_or_set(CACHE_KEY, _get_author_books, None)
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,146 @@
+"""In-memory inverted index used by searchtools.search_within_book.
+
+Each book's index maps words to the notes, terms and sections containing
+them. It's built the first time a book is searched in each process, and kept
+with the data versions it was built from (the global one and the book's, see
+dataversions.py). Those are shared between processes, so an edit handled by
+one worker makes every worker rebuild the index on its next search. The
+signal handlers also drop the index right away in the worker that handled the
+edit, to free the memory.
+"""
+import bisect
+import collections
+import re
+import threading
+
+from django.urls import reverse
+
+from books import dataversions
+from books.utils import int_to_roman
+
+
+# Only this many books are kept in memory at once.
+MAX_BOOKS = 50
+KINDS = ('notes', 'terms', 'sections')
+WORD_REGEX = re.compile(r'\w+')
+
+_indexes = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+class BookIndex:
+    def __init__(self, book):
+        # Each entry is a dict with the display fields and the lowercased
+        # text that's matched against. Entries are in page order per kind.
+        self.entries = []
+        self.words = []
+
+        notes = book.notes.values_list(
+            'pk', 'subject', 'quote', 'comment', 'in_preface', 'page_number'
+        )
+        for pk, subject, quote, comment, in_preface, page in notes:
+            self._add('notes', subject, quote, (subject, quote, comment),
+                      in_preface, page, reverse('view_note', args=[str(pk)]))
+
+        terms = book.terms.values_list(
+            'pk', 'term__text', 'term__definition', 'quote', 'in_preface',
+            'page_number'
+        )
+        for pk, text, definition, quote, in_preface, page in terms:
+            self._add('terms', text, quote, (text, definition, quote),
+                      in_preface, page,
+                      reverse('view_occurrence', args=[str(pk)]))
+
+        sections = book.sections.prefetch_related('authors')
+        for section in sections:
+            authors = ', '.join(a.name for a in section.authors.all())
+            self._add('sections', section.title, authors,
+                      (section.title, authors, section.subtitle,
+                       section.summary),
+                      section.in_preface, section.page_number,
+                      section.get_absolute_url())
+
+        self.words.sort()
+
+    def _add(self, kind, title, description, searchable, in_preface, page,
+             url):
+        entry_id = len(self.entries)
+        text = '\n'.join(searchable).lower()
+        self.entries.append({
+            'kind': kind,
+            'title': title,
+            'description': description,
+            'text': text,
+            'price': int_to_roman(page) if in_preface else page,
+            'url': url,
+        })
+        for word in set(WORD_REGEX.findall(text)):
+            self.words.append((word, entry_id))
+
+    def _find_prefix(self, prefix):
+        entry_ids = set()
+        i = bisect.bisect_left(self.words, (prefix,))
+        while i < len(self.words) and self.words[i][0].startswith(prefix):
+            entry_ids.add(self.words[i][1])
+            i += 1
+        return entry_ids
+
+    def search(self, query):
+        """Returns the entries containing the query, grouped by kind. Only
+        matches starting at the beginning of a word are found."""
+        results = {kind: [] for kind in KINDS}
+        query = query.lower()
+        query_words = WORD_REGEX.findall(query)
+        if not query_words:
+            return results
+
+        entry_ids = None
+        for query_word in sorted(set(query_words), key=len, reverse=True):
+            found = self._find_prefix(query_word)
+            entry_ids = found if entry_ids is None else entry_ids & found
+            if not entry_ids:
+                return results
+
+        for entry_id in sorted(entry_ids):
+            entry = self.entries[entry_id]
+            if query in entry['text']:
+                results[entry['kind']].append(entry)
+        return results
+
+
+def _get_versions(book):
+    return dataversions.get_versions(
+        [dataversions.GLOBAL, dataversions.book(book.slug)]
+    )
+
+
+def get_index(book):
+    versions = _get_versions(book)
+    with _lock:
+        stored = _indexes.get(book.pk)
+        if stored is not None and stored[0] == versions:
+            _indexes.move_to_end(book.pk)
+            return stored[1]
+
+    index = BookIndex(book)
+    # If the book changed while the index was being built, the index may be
+    # out of date already, so it's used for this search only.
+    if _get_versions(book) != versions:
+        return index
+
+    with _lock:
+        _indexes[book.pk] = (versions, index)
+        _indexes.move_to_end(book.pk)
+        while len(_indexes) > MAX_BOOKS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def invalidate(book_id=None):
+    """With no book_id, all indexes are dropped (e.g., if a term or an author
+    is edited, which can affect several books)."""
+    with _lock:
+        if book_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(book_id, None)
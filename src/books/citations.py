@@ -0,0 +1,385 @@
+"""Citation formatting, the stored citations, and the bulk bibliography
+builder for tags.
+
+The format_* functions only take plain data (strings, numbers, dicts), so
+the same formatting is used by the get_citation methods on the models, by
+update_citations, and by build_bibliography. The last two load everything
+they need for many books or notes in a fixed number of queries.
+
+Books, sections and notes store their citation, which the signal handlers
+recompute whenever anything it depends on changes (titles, authors, details,
+page numbers, neighbouring sections).
+
+Tag bibliographies are kept in the shared cache. The signal handlers drop a
+tag's entry when its notes change, and every entry (by bumping a generation
+key) when a book, section or author changes.
+"""
+import bisect
+import operator
+import time
+
+from django.core.cache import cache
+
+
+CACHE_PREFIX = 'books:bibliography'
+GENERATION_KEY = CACHE_PREFIX + ':generation'
+
+
+def format_author_name(name):
+    """Wendy Liu -> Liu, W."""
+    author_name = name.split(' ')
+    last_name = ' '.join(author_name[1:])
+    first_initial = author_name[0][0]
+    return '{last}, {first}.'.format(last=last_name, first=first_initial)
+
+
+def join_author_names(author_names):
+    """Joins the names with commas and an "and" at the end (or "et al" if
+    there are more than 3)."""
+    num_authors = len(author_names)
+    if num_authors == 1:
+        return author_names[0]
+    elif num_authors == 2:
+        return author_names[0] + ' and ' + author_names[1]
+    elif num_authors == 3:
+        return (
+            author_names[0] + ', ' + author_names[1] + ' and ' + author_names[2]
+        )
+    elif num_authors > 3:
+        return author_names[0] + ' et al'
+    else:
+        return '?'
+
+
+def get_book_data(title, details, default_author_names):
+    """details is a dict with is_edited, issue_number, year and publisher, or
+    None for publications. default_author_names is the list of the book's
+    default authors' names, in order."""
+    if details is None:
+        return {
+            'is_edited': False,
+            'issue_number': None,
+            'num_authors': 0,
+            'authors': '',
+            'year': None,
+            'title': title,
+            'publisher': '',
+        }
+
+    if details['issue_number']:
+        # It's a periodical. Set the title to the first author's name.
+        title = default_author_names[0] if default_author_names else ''
+        authors = ''
+        num_authors = 0
+    else:
+        author_names = [format_author_name(n) for n in default_author_names]
+        authors = join_author_names(author_names)
+        num_authors = len(author_names)
+
+    return {
+        'is_edited': details['is_edited'],
+        'issue_number': details['issue_number'],
+        'num_authors': num_authors,
+        'authors': authors,
+        'year': details['year'],
+        'title': title,
+        'publisher': details['publisher'],
+    }
+
+
+def format_book_citation(book_data):
+    """Streeck, W. (2016). _How will capitalism end? Essays on a failing
+    system._ New York: Verso Books."""
+    return '{authors} ({year}). _{title}_. {publisher}.'.format(**book_data)
+
+
+def format_section_citation(book_data, has_details, title, author_names,
+                            page_number, end_page, source_url, date):
+    """Gandy, O. H. (2009). Rational discrimination. In _Coming to terms
+    with chance: Engaging rational discrimination and cumulative
+    disadvantage_. Farnham, VT: Ashgate, pp. 55-76."""
+    d = dict(book_data)
+    d['section_authors'] = join_author_names(
+        [format_author_name(name) for name in author_names]
+    )
+    d['section_title'] = title
+    if d['issue_number']:
+        d['in'] = ''
+        d['publication'] = d['issue_number']
+        d['book_authors'] = ''
+        d['book_title'] = d['title'] + ','
+    else:
+        d['in'] = 'In ' if has_details else ''
+        d['publication'] = d['publisher']
+        d['book_authors'] = d['authors']
+        if d['is_edited']:
+            d['book_authors'] += ' (ed{})'.format('s' if d['num_authors'] > 1 else '')
+        d['book_title'] = d['title'] + '.'
+
+    if has_details:
+        d['ending'] = ', pp. {start}-{end}'.format(start=page_number, end=end_page)
+    else:
+        d['ending'] = source_url
+
+    if date:
+        d['year'] = date.strftime('%Y, %B %d')
+
+    return (
+        '{section_authors} ({year}). {section_title}. '
+        '{in}{book_authors} _{book_title}_ {publication}{ending}'
+    ).format(**d)
+
+
+def format_note_citation(author_names, year, page_number):
+    """(Streeck, 2016, p.12), with last names only."""
+    last_names = [name.split(' ')[-1] for name in author_names]
+    return '({authors}, {year}, p.{page})'.format(
+        authors=join_author_names(last_names),
+        year=year,
+        page=page_number,
+    )
+
+
+def get_end_page(page_numbers, page_number, num_pages):
+    """page_numbers is the sorted list of every section page number in the
+    book (regardless of in_preface), see SectionOutline."""
+    i = bisect.bisect_right(page_numbers, page_number)
+    if i < len(page_numbers):
+        return page_numbers[i] - 1
+    elif num_pages:
+        return num_pages - 1
+
+
+def get_details_data(details):
+    if details is not None:
+        return {
+            'is_edited': details.is_edited,
+            'issue_number': details.issue_number,
+            'year': details.year,
+            'publisher': details.publisher,
+        }
+
+
+def _load_books(book_ids):
+    """Returns a dict of book pk to (book, citation data, set of default
+    author pks), in 2 queries."""
+    # Imported here since models.py uses the formatting functions above.
+    from books.models import Book
+
+    books = Book.objects.filter(pk__in=book_ids).select_related(
+        'details'
+    ).prefetch_related('details__default_authors')
+
+    loaded = {}
+    for book in books:
+        default_authors = (
+            list(book.details.default_authors.all()) if book.details else []
+        )
+        book_data = get_book_data(
+            book.title,
+            get_details_data(book.details),
+            [author.name for author in default_authors],
+        )
+        loaded[book.pk] = (
+            book, book_data, set(author.pk for author in default_authors)
+        )
+    return loaded
+
+
+def _load_page_numbers(book_ids):
+    """Returns a dict of book pk to the sorted list of the book's section
+    page numbers, in 1 query."""
+    from books.models import Section
+
+    page_numbers = {}
+    for book_id, page_number in Section.objects.filter(
+        book_id__in=book_ids
+    ).values_list('book_id', 'page_number'):
+        page_numbers.setdefault(book_id, []).append(page_number)
+    for book_page_numbers in page_numbers.values():
+        book_page_numbers.sort()
+    return page_numbers
+
+
+def _format_section(section, book, book_data, page_numbers):
+    """The section's authors should be prefetched."""
+    has_details = book.details is not None
+    end_page = None
+    if has_details:
+        end_page = get_end_page(
+            page_numbers.get(book.pk, []), section.page_number,
+            book.details.num_pages
+        )
+    return format_section_citation(
+        book_data,
+        has_details,
+        section.title,
+        [author.name for author in section.authors.all()],
+        section.page_number,
+        end_page,
+        section.source_url,
+        section.date,
+    )
+
+
+def build_bibliography(notes):
+    """Returns a sorted list of (citation, url) pairs for the books and
+    sections of the given notes. A section is replaced by its book if it has
+    the book's default authors. Uses 6 queries, however many notes there are.
+    """
+    from books.models import Section
+
+    book_ids = set()
+    section_ids = set()
+    for book_id, section_id in notes.order_by().values_list(
+        'book_id', 'section_id'
+    ).distinct():
+        if section_id:
+            section_ids.add(section_id)
+        else:
+            book_ids.add(book_id)
+
+    sections = list(
+        Section.objects.filter(pk__in=section_ids).prefetch_related('authors')
+    )
+    section_book_ids = set(section.book_id for section in sections)
+    books = _load_books(book_ids | section_book_ids)
+    page_numbers = _load_page_numbers(section_book_ids)
+
+    entries = {}
+    for book_id in book_ids:
+        book, book_data, _ = books[book_id]
+        entries[book.get_absolute_url()] = format_book_citation(book_data)
+
+    for section in sections:
+        book, book_data, default_author_ids = books[section.book_id]
+        has_default_authors = book.details is not None and (
+            set(a.pk for a in section.authors.all()) == default_author_ids
+        )
+        if has_default_authors:
+            entries[book.get_absolute_url()] = format_book_citation(book_data)
+        else:
+            entries[section.get_absolute_url()] = _format_section(
+                section, book, book_data, page_numbers
+            )
+
+    bibliography = [(citation, url) for url, citation in entries.items()]
+    return sorted(bibliography, key=operator.itemgetter(0))
+
+
+def _get_note_year(book, section):
+    if book.details:
+        return book.details.year
+    elif section is not None and section.date:
+        return section.date.year
+    else:
+        return '????'
+
+
+def _format_note(note, book, section):
+    """The note's authors should be prefetched."""
+    return format_note_citation(
+        [author.name for author in note.authors.all()],
+        _get_note_year(book, section),
+        note.page_number,
+    )
+
+
+def _save_changed(model, instances_and_citations):
+    changed = []
+    for instance, citation in instances_and_citations:
+        if instance.citation != citation:
+            instance.citation = citation
+            changed.append(instance)
+    model.objects.bulk_update(changed, ['citation'], batch_size=500)
+    return len(changed)
+
+
+def update_citations(book_ids, include_notes=True):
+    """Recomputes the stored citations of the given books and their sections
+    (and notes, unless include_notes is False) in a fixed number of queries,
+    and saves the ones that have changed. Returns the number saved.
+
+    Uses bulk_update, so no signals are sent."""
+    from books.models import Book, Note, Section
+
+    book_ids = set(book_ids)
+    books = _load_books(book_ids)
+    page_numbers = _load_page_numbers(book_ids)
+    sections = Section.objects.filter(book_id__in=book_ids).only(
+        'book', 'title', 'page_number', 'source_url', 'date', 'citation'
+    ).prefetch_related('authors')
+    sections = {section.pk: section for section in sections}
+
+    num_saved = _save_changed(Book, [
+        (book, format_book_citation(book_data))
+        for book, book_data, _ in books.values()
+    ])
+    num_saved += _save_changed(Section, [
+        (section, _format_section(section, *books[section.book_id][:2],
+                                  page_numbers))
+        for section in sections.values()
+        # The book can be gone if it's being deleted.
+        if section.book_id in books
+    ])
+
+    if include_notes:
+        notes = Note.objects.filter(book_id__in=book_ids).only(
+            'book', 'section', 'page_number', 'citation'
+        ).prefetch_related('authors')
+        num_saved += _save_changed(Note, [
+            (note, _format_note(note, books[note.book_id][0],
+                                sections.get(note.section_id)))
+            for note in notes if note.book_id in books
+        ])
+
+    return num_saved
+
+
+def update_note_citations(note_ids):
+    """Recomputes the stored citations of the given notes only."""
+    from books.models import Note
+
+    notes = Note.objects.filter(pk__in=note_ids).only(
+        'book', 'section', 'page_number', 'citation'
+    ).select_related('book__details', 'section').prefetch_related('authors')
+    return _save_changed(Note, [
+        (note, _format_note(note, note.book, note.section)) for note in notes
+    ])
+
+
+def update_all_citations(batch_size=100):
+    """For the rebuild_citations command. Returns the number saved."""
+    from books.models import Book
+
+    book_ids = list(Book.objects.values_list('pk', flat=True))
+    num_saved = 0
+    for i in range(0, len(book_ids), batch_size):
+        num_saved += update_citations(book_ids[i:i + batch_size])
+    return num_saved
+
+
+def _get_key(tag_id):
+    # Bumping the generation invalidates every tag at once. It starts from
+    # the time, so that a generation that's been evicted from the cache
+    # doesn't come back with a value it's already had.
+    generation = cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+    return '{}:{}:{}'.format(CACHE_PREFIX, generation, tag_id)
+
+
+def get_tag_bibliography(tag):
+    return cache.get_or_set(
+        _get_key(tag.pk), lambda: build_bibliography(tag.notes.all()), None
+    )
+
+
+def invalidate(tag_ids):
+    cache.delete_many([_get_key(tag_id) for tag_id in tag_ids])
+
+
+def invalidate_all():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # The generation isn't set yet, so nothing has been cached.
+        pass
@@ -0,0 +1,96 @@
+"""Keeps the num_notes and num_terms counters on Book and Section up to date.
+
+The signal handlers (see signal_handlers.py) adjust the counters whenever a
+note or term occurrence is created, moved to a different book/section, or
+deleted. They run in the same transaction as the save (see
+SectionArtefact.save) or the delete. Bulk operations bypass signals, so the rebuild_counters management
+command can be used to find and fix any drift.
+"""
+from django.db.models import Count, F
+
+from books.models import Book, Section
+
+
+# The counter field on Book and Section for each kind of artefact.
+COUNTER_FIELDS = {
+    'books.Note': 'num_notes',
+    'vocab.TermOccurrence': 'num_terms',
+}
+# The related_name on Book and Section for each counter field.
+RELATED_NAMES = {
+    'num_notes': 'notes',
+    'num_terms': 'terms',
+}
+
+
+def _get_location(instance):
+    """Returns None if either field was deferred (so we can't tell whether
+    the artefact has moved when it's saved)."""
+    if 'book_id' in instance.__dict__ and 'section_id' in instance.__dict__:
+        return (instance.book_id, instance.section_id)
+
+
+def remember_location(instance):
+    instance._counted_location = _get_location(instance)
+
+
+def _adjust(field, location, delta):
+    book_id, section_id = location
+    for model, pk in ((Book, book_id), (Section, section_id)):
+        if pk is None:
+            continue
+        counted = model.objects.filter(pk=pk)
+        if delta < 0:
+            # Never go below 0, even if the counters have drifted.
+            counted = counted.filter(**{field + '__gt': 0})
+        counted.update(**{field: F(field) + delta})
+
+
+def artefact_saved(instance, created):
+    field = COUNTER_FIELDS[instance._meta.label]
+    new_location = _get_location(instance)
+    if created:
+        _adjust(field, new_location, 1)
+    else:
+        old_location = getattr(instance, '_counted_location', None)
+        if old_location is not None and old_location != new_location:
+            _adjust(field, old_location, -1)
+            _adjust(field, new_location, 1)
+
+    instance._counted_location = new_location
+
+
+def artefact_deleted(instance):
+    field = COUNTER_FIELDS[instance._meta.label]
+    _adjust(field, (instance.book_id, instance.section_id), -1)
+
+
+def find_drift(model):
+    """Returns a list of (instance, field, stored, actual) tuples for every
+    counter that doesn't match the real count. The instances only have their
+    pk and counter fields loaded."""
+    fields = list(RELATED_NAMES)
+    annotations = {
+        'actual_' + field: Count(related_name, distinct=True)
+        for field, related_name in RELATED_NAMES.items()
+    }
+    drift = []
+    for instance in model.objects.only('pk', *fields).annotate(**annotations):
+        for field in fields:
+            stored = getattr(instance, field)
+            actual = getattr(instance, 'actual_' + field)
+            if stored != actual:
+                drift.append((instance, field, stored, actual))
+    return drift
+
+
+def fix_drift(model, drift):
+    """Takes the output of find_drift."""
+    instances = {}
+    for instance, field, stored, actual in drift:
+        setattr(instance, field, actual)
+        instances[instance.pk] = instance
+
+    model.objects.bulk_update(
+        instances.values(), list(RELATED_NAMES), batch_size=500
+    )
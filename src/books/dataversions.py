@@ -0,0 +1,104 @@
+"""Data versions, for caching whole pages (see bookmarker/responsecache.py).
+
+A data version is a number in the shared cache for a named piece of data:
+
+* 'global': anything that's shown on many pages (books, sections, authors,
+  tags, terms)
+* 'notes' and 'terms': any note or term occurrence
+* 'book:<slug>', 'section:<pk>' and 'tag:<slug>': the notes and term
+  occurrences shown on that object's page
+
+The signal handlers bump the versions of whatever an edit touches (a note or
+term occurrence being added, edited or deleted, and so on). Anything cached
+under a key that includes the versions it depends on is then never served
+stale, and never has to be deleted.
+
+A version is the time it was bumped (or first asked for), in nanoseconds, so
+the latest of a page's versions is also a Last-Modified time for it.
+"""
+import datetime
+import time
+
+from django.core.cache import cache
+
+from books.models import Book
+
+
+CACHE_PREFIX = 'books:dataversion'
+GLOBAL = 'global'
+NOTES = 'notes'
+TERMS = 'terms'
+
+
+def book(slug):
+    return 'book:{}'.format(slug)
+
+
+def section(pk):
+    return 'section:{}'.format(pk)
+
+
+def tag(slug):
+    return 'tag:{}'.format(slug)
+
+
+def _get_key(name):
+    return '{}:{}'.format(CACHE_PREFIX, name)
+
+
+def _new_version():
+    # Also means a version that's been evicted from the cache doesn't start
+    # again from a value it's already had.
+    return time.time_ns()
+
+
+def get_versions(names):
+    """Returns the list of versions for the names, in the same order."""
+    keys = [_get_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(names):
+    version = _new_version()
+    cache.set_many({_get_key(name): version for name in set(names)}, None)
+
+
+def get_last_modified(versions):
+    """Returns the time of the latest of the versions, as an aware
+    datetime."""
+    return datetime.datetime.fromtimestamp(
+        max(versions) / 1e9, tz=datetime.timezone.utc
+    )
+
+
+def bump_all():
+    """For bulk changes, which don't send signals. Everything cached depends
+    on the global version."""
+    bump([GLOBAL])
+
+
+def get_or_set(key, names, default, timeout=None):
+    """cache.get_or_set, for a value that depends on the given data
+    versions."""
+    versions = get_versions(names)
+    key = '{}:{}'.format(key, ':'.join(str(v) for v in versions))
+    return cache.get_or_set(key, default, timeout)
+
+
+def bump_for_artefact(kind, book_id, section_id):
+    """For a note (kind NOTES) or term occurrence (kind TERMS) that's been
+    saved or deleted."""
+    names = [kind]
+    book_slug = Book.objects.filter(pk=book_id).values_list(
+        'slug', flat=True
+    ).first()
+    if book_slug is not None:
+        names.append(book(book_slug))
+    if section_id is not None:
+        names.append(section(section_id))
+    bump(names)
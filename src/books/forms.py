@@ -179,7 +179,7 @@ class NoteForm(forms.ModelForm, SectionChoiceForm, PageNumberForm):
         if section:
             note.section = section
         else:
-            note.section = note.determine_section()
+            note.section_id = note.determine_section_id()
 
         note.save()
         self.save_m2m()
@@ -0,0 +1,105 @@
+"""Postgres full-text search for searchtools.get_search_results.
+
+Each searchable model has a stored search_vector column, kept up to date by
+signal handlers (see signal_handlers.py) and backfilled with the
+update_search_vectors management command. The GIN indexes are created after
+migrating, since the migrations are generated per deployment and SQLite
+doesn't understand them. On SQLite, none of this is used and searchtools falls
+back to the regex search.
+"""
+from django.apps import apps
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+                                           SearchVector
+from django.db import connection, connections
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Coalesce
+
+
+SEARCH_CONFIG = 'english'
+
+# The (field, weight) pairs that make up each model's search_vector. Fields on
+# related models can't be used in an UPDATE, so a term occurrence only stores
+# its quote; the term's text and definition live on Term's own vector.
+VECTOR_FIELDS = {
+    'books.Book': (('title', 'A'), ('summary', 'B')),
+    'books.Section': (('title', 'A'), ('subtitle', 'B'), ('summary', 'C')),
+    'books.Note': (('subject', 'A'), ('quote', 'B'), ('comment', 'C')),
+    'vocab.Term': (('text', 'A'), ('definition', 'B')),
+    'vocab.TermOccurrence': (('quote', 'B'),),
+}
+
+
+def is_enabled():
+    return connection.vendor == 'postgresql'
+
+
+def get_vector(model_label):
+    vector = None
+    for field, weight in VECTOR_FIELDS[model_label]:
+        field_vector = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        if vector is None:
+            vector = field_vector
+        else:
+            vector = vector + field_vector
+    return vector
+
+
+def get_query(query):
+    """websearch syntax, so "quoted phrases" and -exclusions work as
+    expected."""
+    return SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+
+
+def get_rank(search_query, include_term=False):
+    """Unpopulated vectors rank as 0 rather than NULL (which would otherwise
+    be sorted first)."""
+    rank = Coalesce(
+        SearchRank(F('search_vector'), search_query),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+    if include_term:
+        rank = rank + Coalesce(
+            SearchRank(F('term__search_vector'), search_query),
+            Value(0.0),
+            output_field=FloatField(),
+        )
+    return rank
+
+
+def update_search_vector(instance):
+    """Uses update() rather than save() so that the post_save signal isn't
+    triggered again."""
+    model_label = instance._meta.label
+    if not is_enabled() or model_label not in VECTOR_FIELDS:
+        return
+
+    type(instance).objects.filter(pk=instance.pk).update(
+        search_vector=get_vector(model_label)
+    )
+
+
+def update_all_search_vectors():
+    """Returns a dict of model label to the number of rows updated."""
+    counts = {}
+    for model_label in VECTOR_FIELDS:
+        model = apps.get_model(model_label)
+        counts[model_label] = model.objects.update(
+            search_vector=get_vector(model_label)
+        )
+    return counts
+
+
+def create_search_indexes(using='default', **kwargs):
+    """Connected to post_migrate in BooksConfig."""
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+
+    with db.cursor() as cursor:
+        for model_label in VECTOR_FIELDS:
+            table = apps.get_model(model_label)._meta.db_table
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS {table}_search_vector_gin '
+                'ON {table} USING gin (search_vector)'.format(table=table)
+            )
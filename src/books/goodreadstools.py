@@ -1,14 +1,12 @@
-import bs4
-import collections
-# hacking bs4 support for latest Python
-collections.Callable = collections.abc.Callable
 from datetime import datetime
-import requests
+import io
 import urllib.parse
 
 from django.conf import settings
+from lxml import etree
 
 from books.models import BookDetails, GoodreadsAuthor, IgnoredBook
+from goodreads_cache import feeds
 
 
 USER_ID = '60292716-wendy-liu'
@@ -43,32 +41,67 @@ def _strip_cdata(text):
     return text
 
 
-def _parse_rss(content):
-    soup = bs4.BeautifulSoup(content, "xml")
-    rows = soup.select("rss item")
-    books = []
-    goodreads_book_ids = set()
-    goodreads_author_names = set()
-    for row in rows:
+# The fields read from each <item> (the first element with each name).
+ITEM_FIELDS = frozenset([
+    'title', 'book_id', 'user_shelves', 'user_review', 'book_published',
+    'isbn', 'num_pages', 'book_large_image_url', 'user_rating', 'author_name',
+])
+
+
+def _get_text(element):
+    """All the text inside the element, without comments."""
+    return element.xpath('string()')
+
+
+def _get_string(element):
+    """The element's only child, if it's text or a comment (which is how
+    some of the fields come through); None if there's more than one."""
+    children = element.xpath('node()')
+    if len(children) != 1:
+        return None
+    child = children[0]
+    if isinstance(child, str):
+        return str(child)
+    elif isinstance(child, etree._Comment):
+        return child.text
+    else:
+        return _get_string(child)
+
+
+def _iter_items(content):
+    """Yields a book dict for each <item> in the feed, as it's parsed. Each
+    item is thrown away once it's been read, so memory use doesn't grow with
+    the size of the feed."""
+    source = io.BytesIO(content.encode())
+    for _, item in etree.iterparse(source, tag='item', recover=True):
+        fields = {}
+        for element in item.iter(*ITEM_FIELDS):
+            fields.setdefault(element.tag, element)
+
         # I HATE GOODREADS
-        title = _strip_cdata(row.select_one('title').string)
-        goodreads_id = row.select_one('book_id').text.strip()
+        title = _strip_cdata(_get_string(fields['title']))
+        goodreads_id = _get_text(fields['book_id']).strip()
         goodreads_url = BOOK_URL + goodreads_id
-        shelves = _strip_cdata(row.select_one('user_shelves').string)
-        review = _strip_cdata(row.select_one('user_review').string)
-        year = row.select_one('book_published').text.strip()
-        isbn = row.select_one('isbn').text.strip()
-        num_pages = _parse_num_pages(row.select_one('num_pages').text)
-        image_url = _strip_cdata(row.select_one('book_large_image_url').string)
-        rating = int(row.select_one('user_rating').text.strip())
-        author_name = row.select_one('author_name').text.strip()
+        shelves = _strip_cdata(_get_string(fields['user_shelves']))
+        review = _strip_cdata(_get_string(fields['user_review']))
+        year = _get_text(fields['book_published']).strip()
+        isbn = _get_text(fields['isbn']).strip()
+        num_pages = _parse_num_pages(_get_text(fields['num_pages']))
+        image_url = _strip_cdata(_get_string(fields['book_large_image_url']))
+        rating = int(_get_text(fields['user_rating']).strip())
+        author_name = _get_text(fields['author_name']).strip()
+
+        item.clear()
+        # Drop the references to the items that have already been read.
+        while item.getprevious() is not None:
+            del item.getparent()[0]
 
         ignore_link_params = urllib.parse.urlencode({
             'goodreads_id': goodreads_id,
             'description': title,
         })
 
-        book = {
+        yield {
             'title': title,
             'id': goodreads_id,
             'link': goodreads_url,
@@ -82,17 +115,30 @@ def _parse_rss(content):
             'author_name': author_name,
             'ignore_link_params': ignore_link_params,
         }
-        goodreads_book_ids.add(goodreads_id)
-        goodreads_author_names.add(author_name)
-        books.append(book)
+
+
+def _parse_rss(content):
+    return reconcile(list(_iter_items(content)))
+
+
+def reconcile(books):
+    """Takes the book dicts from _iter_items (for any number of pages) and
+    returns the ones that still need to be added or processed, along with
+    the links to do so. Uses 3 queries, however many books there are."""
+    goodreads_book_ids = set(book['id'] for book in books)
+    goodreads_author_names = set(book['author_name'] for book in books)
 
     # Figure out which of the books and authors are already in our DB
-    details_query = BookDetails.objects.filter(goodreads_id__in=goodreads_book_ids)
+    details_query = BookDetails.objects.filter(
+        goodreads_id__in=goodreads_book_ids
+    ).select_related('book')
     details_dict = {}
     for d in details_query:
         details_dict[d.goodreads_id] = d
 
-    author_query = GoodreadsAuthor.objects.filter(author__name__in=goodreads_author_names)
+    author_query = GoodreadsAuthor.objects.filter(
+        author__name__in=goodreads_author_names
+    ).select_related('author')
     author_dict = {}
     for a in author_query:
         author_dict[a.author.name] = a.author
@@ -149,8 +195,12 @@ def _parse_rss(content):
     return filtered_books
 
 
-def get_books(page):
-    """This is a horrible and obviously temporary workaround but I guess Goodreads just changed their website to require auth for the review list page. So we fake it by sending some cookies to simulate being logged in. I just downloaded some subset from my current active session which seems to work. I think the earliest one expires Oct 24 2026. Whatever, I'll deal with it then.
+def fetch_page(page, max_age=None):
+    """Returns the FeedPage (see goodreads_cache) for a page of the read
+    shelf. It's only requested again if it's older than max_age (always, if
+    max_age is None), and then conditionally.
+
+    This is a horrible and obviously temporary workaround but I guess Goodreads just changed their website to require auth for the review list page. So we fake it by sending some cookies to simulate being logged in. I just downloaded some subset from my current active session which seems to work. I think the earliest one expires Oct 24 2026. Whatever, I'll deal with it then.
     Not checked into source control for obvious reasons. Must be added as an environment variable.
     NEW AS OF JUL 14 2026: The previous URL returns a 202 so I guess I'd better switch to the RSS link.
     """
@@ -159,11 +209,10 @@ def get_books(page):
         'ubid-main': settings.GOODREADS_UBID_COOKIE,
     }
     url = '{}&page={}'.format(READ_URL, page)
-    response = requests.get(url, headers={
+    headers = {
         'User-Agent': USER_AGENT  # we just need a fake user agent or it 403s
-    }, cookies=cookies)
-    response.raise_for_status()
-    return _parse_rss(response.content.decode())
+    }
+    return feeds.fetch(url, headers=headers, cookies=cookies, max_age=max_age)
 
 
 def get_author_id(link):
@@ -1,15 +1,20 @@
+import functools
 import re
 
 from django.template.defaultfilters import truncatechars, truncatechars_html
 
 
+@functools.lru_cache(maxsize=128)
+def _get_pattern(query):
+    return re.compile('({})'.format(re.escape(query)), flags=re.IGNORECASE)
+
+
 def highlight(text, query, truncate_to=None):
     """Replaces all instances of [query] within [text] with <highlight>[query]</highlight, and truncates to the first [num_chars] characters (respecting html)."""
     query_lower = query.lower()
     text_lower = text.lower()
     if query_lower in text_lower:
-        r = '({})'.format(re.escape(query))
-        s = re.sub(r, r'<mark>\1</mark>', text, flags=re.IGNORECASE)
+        s = _get_pattern(query).sub(r'<mark>\1</mark>', text)
 
         if truncate_to:
             # Make sure the query appears in the truncated result.
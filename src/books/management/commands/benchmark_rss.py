@@ -0,0 +1,102 @@
+import os
+import re
+import statistics
+import time
+
+try:
+    import bs4
+except ImportError:
+    bs4 = None
+from django.core.management.base import BaseCommand, CommandError
+
+from books import goodreadstools
+
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', 'bookmarker', 'tests',
+    'goodreads_rss.xml'
+)
+ITEM_REGEX = re.compile(r'<item>.*?</item>', re.DOTALL)
+
+
+def parse_with_soup(content):
+    """The BeautifulSoup version of goodreadstools._iter_items, which it
+    replaced, for comparison."""
+    soup = bs4.BeautifulSoup(content, 'xml')
+    books = []
+    for row in soup.select('rss item'):
+        books.append({
+            'title': goodreadstools._strip_cdata(row.select_one('title').string),
+            'id': row.select_one('book_id').text.strip(),
+            'shelves': goodreadstools._strip_cdata(
+                row.select_one('user_shelves').string
+            ),
+            'review': goodreadstools._strip_cdata(
+                row.select_one('user_review').string
+            ),
+            'year': row.select_one('book_published').text.strip(),
+            'isbn': row.select_one('isbn').text.strip(),
+            'num_pages': goodreadstools._parse_num_pages(
+                row.select_one('num_pages').text
+            ),
+            'image_url': goodreadstools._strip_cdata(
+                row.select_one('book_large_image_url').string
+            ),
+            'rating': int(row.select_one('user_rating').text.strip()),
+            'author_name': row.select_one('author_name').text.strip(),
+        })
+    return books
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the Goodreads RSS parser (and the BeautifulSoup one it '
+        'replaced, if bs4 is installed) on a feed with the items of the test '
+        'file repeated, to simulate a large shelf.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=DEFAULT_PATH)
+        parser.add_argument('--items', type=int, default=1000,
+                            help='Number of items in the feed')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def make_feed(self, content, num_items):
+        items = ITEM_REGEX.findall(content)
+        if not items:
+            raise CommandError('No <item> in the file')
+        start = content.index(items[0])
+        end = content.rindex(items[-1]) + len(items[-1])
+        repeated = [items[i % len(items)] for i in range(num_items)]
+        return content[:start] + '\n'.join(repeated) + content[end:]
+
+    def time_parser(self, parse, content, repeat):
+        timings = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            num_books = len(parse(content))
+            timings.append((time.perf_counter() - start) * 1000)
+        return num_books, statistics.median(timings)
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        with open(options['path']) as f:
+            content = self.make_feed(f.read(), options['items'])
+
+        parsers = [
+            ('lxml', lambda c: list(goodreadstools._iter_items(c))),
+        ]
+        if bs4 is None:
+            self.stderr.write('bs4 is not installed, skipping it')
+        else:
+            parsers.append(('bs4', parse_with_soup))
+
+        for name, parse in parsers:
+            num_books, median_ms = self.time_parser(
+                parse, content, options['repeat']
+            )
+            self.stdout.write('{}: {} books, median {:.2f} ms'.format(
+                name, num_books, median_ms
+            ))
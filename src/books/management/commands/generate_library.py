@@ -0,0 +1,284 @@
+import bisect
+import datetime
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from activity.models import Action
+from books import citations, counters, dataversions, fulltext, rendering
+from books.models import Author, Book, BookDetails, Note, Section, Tag, \
+                         TagCategory
+from vocab.models import Term, TermCategory, TermOccurrence
+
+
+WORDS = (
+    'capital labour value market state power class history theory form '
+    'social political economic crisis society production money work time '
+    'nature culture language memory desire reason freedom order critique '
+    'method practice structure system subject object image text reading '
+    'writing city land law war peace empire nation border future past'
+).split()
+SLUG_PREFIX = 'synthetic-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the database with a reproducible synthetic library, for '
+        'benchmarking (see run_benchmarks). Uses bulk inserts, then fills in '
+        'the counters, the rendered HTML, the citations and the search '
+        'vectors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=50)
+        parser.add_argument('--publications', type=int, default=10)
+        parser.add_argument('--sections', type=int, default=15,
+                            help='Per book')
+        parser.add_argument('--notes', type=int, default=40,
+                            help='Per book')
+        parser.add_argument('--occurrences', type=int, default=20,
+                            help='Per book')
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--tags', type=int, default=30)
+        parser.add_argument('--terms', type=int, default=300)
+        parser.add_argument('--actions', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--append',
+            action='store_true',
+            help="Don't refuse to run if there are already books",
+        )
+
+    def handle(self, *args, **options):
+        if Book.objects.exists() and not options['append']:
+            raise CommandError(
+                'The database already has books (use --append to add to it)'
+            )
+        if Book.objects.filter(slug__startswith=SLUG_PREFIX).exists():
+            raise CommandError('A synthetic library has already been generated')
+
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            self.generate(options)
+
+        counts = rendering.update_all_html_fields()
+        citations.update_all_citations()
+        if fulltext.is_enabled():
+            fulltext.update_all_search_vectors()
+        dataversions.bump_all()
+        for model_label, count in counts.items():
+            self.stdout.write('{}: {} rows'.format(model_label, count))
+
+    def words(self, num_words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(num_words))
+
+    def sample(self, population, max_size):
+        return self.random.sample(
+            population, self.random.randint(1, min(max_size, len(population)))
+        )
+
+    def generate(self, options):
+        authors = Author.objects.bulk_create([
+            Author(
+                name='{} {}'.format(self.words(1).title(), self.words(1).title()),
+                slug='{}author-{}'.format(SLUG_PREFIX, i),
+            )
+            for i in range(options['authors'])
+        ])
+
+        categories = TagCategory.objects.bulk_create([
+            TagCategory(slug='{}{}'.format(SLUG_PREFIX, i)) for i in range(3)
+        ])
+        tags = Tag.objects.bulk_create([
+            Tag(
+                slug='{}tag-{}'.format(SLUG_PREFIX, i),
+                category=self.random.choice(categories),
+                # Every fifth tag is shown on the faves page.
+                faved=i % 5 == 0,
+            )
+            for i in range(options['tags'])
+        ])
+
+        term_categories = list(TermCategory.objects.all())
+        if not term_categories:
+            term_categories = TermCategory.objects.bulk_create([
+                TermCategory(name='Category {}'.format(i), description='',
+                             confidence=i * 50)
+                for i in range(3)
+            ])
+        terms = Term.objects.bulk_create([
+            Term(
+                text='{} {}'.format(self.words(1), i),
+                definition=self.words(20),
+                highlights='{} {}'.format(self.words(1), i),
+                flagged=i % 10 == 0,
+            )
+            for i in range(options['terms'])
+        ])
+
+        num_books = options['books'] + options['publications']
+        all_details = BookDetails.objects.bulk_create([
+            BookDetails(
+                link='https://example.com/{}'.format(i),
+                year=self.random.randint(1900, 2020),
+                publisher=self.words(2).title(),
+                num_pages=self.random.randint(100, 600),
+                rating=self.random.randint(0, 5),
+                start_date=datetime.date(2020, 1, 1),
+                end_date=datetime.date(2020, 1, 1) + datetime.timedelta(days=i),
+            )
+            for i in range(options['books'])
+        ])
+        books = Book.objects.bulk_create([
+            Book(
+                title=self.words(4).capitalize(),
+                slug='{}book-{}'.format(SLUG_PREFIX, i),
+                summary=self.words(50),
+                details=all_details[i] if i < len(all_details) else None,
+                is_processed=self.random.random() < 0.5,
+                completed_read=self.random.random() < 0.7,
+            )
+            for i in range(num_books)
+        ])
+
+        details_authors = []
+        details_default_authors = []
+        for details in all_details:
+            for author in self.sample(authors, 2):
+                details_authors.append(BookDetails.authors.through(
+                    bookdetails_id=details.pk, author_id=author.pk
+                ))
+                details_default_authors.append(
+                    BookDetails.default_authors.through(
+                        bookdetails_id=details.pk, author_id=author.pk
+                    )
+                )
+        BookDetails.authors.through.objects.bulk_create(details_authors)
+        BookDetails.default_authors.through.objects.bulk_create(
+            details_default_authors
+        )
+
+        sections = []
+        for book in books:
+            num_pages = book.details.num_pages if book.details else 300
+            page_numbers = sorted(self.random.sample(
+                range(1, num_pages), min(options['sections'], num_pages - 1)
+            ))
+            for number, page_number in enumerate(page_numbers, 1):
+                sections.append(Section(
+                    book=book,
+                    number=number,
+                    title=self.words(3).capitalize(),
+                    summary=self.words(30),
+                    page_number=page_number,
+                    rating=self.random.randint(0, 5),
+                ))
+        sections = Section.objects.bulk_create(sections)
+        Section.authors.through.objects.bulk_create([
+            Section.authors.through(section_id=section.pk, author_id=author.pk)
+            for section in sections
+            for author in self.sample(authors, 2)
+        ])
+
+        # Sorted (page_number, section) per book, to assign the artefacts.
+        boundaries = {}
+        for section in sections:
+            boundaries.setdefault(section.book_id, []).append(
+                (section.page_number, section)
+            )
+
+        def get_page_and_section(book):
+            book_sections = boundaries.get(book.pk, [])
+            num_pages = book.details.num_pages if book.details else 300
+            page_number = self.random.randint(1, num_pages)
+            i = bisect.bisect_right(
+                [page for page, _ in book_sections], page_number
+            )
+            return page_number, book_sections[i - 1][1] if i else None
+
+        notes = []
+        occurrences = []
+        for book in books:
+            for _ in range(options['notes']):
+                page_number, section = get_page_and_section(book)
+                notes.append(Note(
+                    book=book,
+                    section=section,
+                    page_number=page_number,
+                    subject=self.words(3).capitalize(),
+                    quote=self.words(self.random.randint(20, 120)),
+                    comment=self.words(self.random.randint(0, 30)),
+                ))
+            for _ in range(options['occurrences']):
+                page_number, section = get_page_and_section(book)
+                term = self.random.choice(terms)
+                occurrences.append(TermOccurrence(
+                    book=book,
+                    section=section,
+                    page_number=page_number,
+                    term=term,
+                    quote='{} {} {}'.format(
+                        self.words(10), term.highlights, self.words(10)
+                    ),
+                    category=self.random.choice(term_categories),
+                    is_new=self.random.random() < 0.3,
+                    is_defined=self.random.random() < 0.1,
+                ))
+        notes = Note.objects.bulk_create(notes)
+        occurrences = TermOccurrence.objects.bulk_create(occurrences)
+
+        Note.tags.through.objects.bulk_create([
+            Note.tags.through(note_id=note.pk, tag_id=tag.pk)
+            for note in notes
+            for tag in self.sample(tags, 3)
+        ])
+        Note.authors.through.objects.bulk_create([
+            Note.authors.through(note_id=note.pk, author_id=author.pk)
+            for note in notes
+            for author in self.sample(authors, 1)
+        ])
+        TermOccurrence.authors.through.objects.bulk_create([
+            TermOccurrence.authors.through(
+                termoccurrence_id=occurrence.pk, author_id=author.pk
+            )
+            for occurrence in occurrences
+            for author in self.sample(authors, 1)
+        ])
+
+        primary_ids = {
+            'book': [book.pk for book in books],
+            'note': [note.pk for note in notes],
+            'section': [section.pk for section in sections],
+            'term': [occurrence.pk for occurrence in occurrences],
+        }
+        artefacts = {
+            'note': {note.pk: note.book_id for note in notes},
+            'section': {section.pk: section.book_id for section in sections},
+            'term': {o.pk: o.book_id for o in occurrences},
+        }
+        now = timezone.now()
+        actions = []
+        for i in range(options['actions']):
+            category = self.random.choice(sorted(primary_ids))
+            primary_id = self.random.choice(primary_ids[category])
+            actions.append(Action(
+                category=category,
+                verb='added',
+                primary_id=primary_id,
+                secondary_id=artefacts.get(category, {}).get(primary_id),
+                timestamp=now - datetime.timedelta(minutes=i),
+            ))
+        Action.objects.bulk_create(actions)
+
+        for model in (Book, Section):
+            counters.fix_drift(model, counters.find_drift(model))
+
+        self.stdout.write(
+            '{} books, {} sections, {} notes, {} term occurrences, '
+            '{} actions'.format(
+                len(books), len(sections), len(notes), len(occurrences),
+                len(actions)
+            )
+        )
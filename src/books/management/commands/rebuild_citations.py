@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from books import citations, dataversions
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored citations of books, sections and notes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of books to recompute at once',
+        )
+
+    def handle(self, *args, **options):
+        num_saved = citations.update_all_citations(options['batch_size'])
+        self.stdout.write('{} citations updated'.format(num_saved))
+        citations.invalidate_all()
+        dataversions.bump_all()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from books import counters, dataversions
+from books.models import Book, Section
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the num_notes/num_terms counters on books and sections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report the drift, don't fix it",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Book, Section):
+            drift = counters.find_drift(model)
+            for instance, field, stored, actual in drift:
+                self.stdout.write('{model} {pk}: {field} is {stored}, should be {actual}'.format(
+                    model=model.__name__,
+                    pk=instance.pk,
+                    field=field,
+                    stored=stored,
+                    actual=actual,
+                ))
+
+            if drift and not options['dry_run']:
+                counters.fix_drift(model, drift)
+                dataversions.bump_all()
+            self.stdout.write('{}: {} counters drifted'.format(
+                model.__name__, len(drift)
+            ))
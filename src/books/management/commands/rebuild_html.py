@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from books import dataversions, rendering
+
+
+class Command(BaseCommand):
+    help = 'Re-renders the stored Markdown HTML of books, sections and notes.'
+
+    def handle(self, *args, **options):
+        counts = rendering.update_all_html_fields()
+        for model_label, count in counts.items():
+            self.stdout.write('{}: {} rows updated'.format(model_label, count))
+        dataversions.bump_all()
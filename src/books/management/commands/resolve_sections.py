@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from books import counters, dataversions
+from books.models import Book, Section
+from books.outline import resolve_sections
+
+
+class Command(BaseCommand):
+    help = (
+        'Reassigns notes and term occurrences to the section containing '
+        'their page. Publications are skipped, since their articles are '
+        'chosen by hand.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'slugs',
+            nargs='*',
+            metavar='slug',
+            help='Only these books (default: the whole library)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report the changes, don't save them",
+        )
+
+    def handle(self, *args, **options):
+        books = Book.objects.filter(details__isnull=False)
+        if options['slugs']:
+            books = books.filter(slug__in=options['slugs'])
+            missing = set(options['slugs']) - set(
+                books.values_list('slug', flat=True)
+            )
+            if missing:
+                raise CommandError('No such books: {}'.format(
+                    ', '.join(sorted(missing))
+                ))
+
+        total = 0
+        for book in books.iterator():
+            changed = resolve_sections(book)
+            for model, artefacts in changed.items():
+                if not artefacts:
+                    continue
+
+                total += len(artefacts)
+                self.stdout.write('{book}: {count} {model} changed'.format(
+                    book=book.slug,
+                    count=len(artefacts),
+                    model=model._meta.verbose_name_plural,
+                ))
+                if not options['dry_run']:
+                    model.objects.bulk_update(
+                        artefacts, ['section'], batch_size=500
+                    )
+
+        if total and not options['dry_run']:
+            # bulk_update doesn't send signals, so the section counters need
+            # to be fixed up.
+            with transaction.atomic():
+                counters.fix_drift(Section, counters.find_drift(Section))
+            dataversions.bump_all()
+
+        self.stdout.write('{} artefacts {}'.format(
+            total, 'to change' if options['dry_run'] else 'changed'
+        ))
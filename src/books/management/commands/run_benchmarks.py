@@ -0,0 +1,155 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from activity.models import Action
+from books import searchtools
+from books.models import Author, Book, Note, Section, Tag
+from vocab.models import TermOccurrence
+
+
+SEARCH_QUERY = 'capital'
+# An empty cache for every run, so that the first request to each page is
+# really cold (and nothing is written to the site's cache directory).
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'run_benchmarks',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the main views against the current database (e.g., one '
+        'filled by generate_library) and writes the results as JSON, so '
+        'they can be compared across commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--output',
+            help='Path to write the JSON to (default: stdout)',
+        )
+        parser.add_argument(
+            '--user',
+            help='Username to log in as (default: run as a guest)',
+        )
+
+    def get_urls(self):
+        """Returns a list of (name, url) pairs."""
+        urls = [
+            ('home', reverse('home')),
+            ('view_all_authors', reverse('view_all_authors')),
+            ('view_faves', reverse('view_faves')),
+            ('search', '{}?q={}'.format(reverse('search'), SEARCH_QUERY)),
+        ]
+        for mode in searchtools.MODES:
+            urls.append((
+                'search:{}'.format(mode),
+                '{}?q={}&mode={}'.format(reverse('search'), SEARCH_QUERY, mode),
+            ))
+
+        author = Author.objects.order_by('pk').first()
+        if author:
+            urls.append(('view_author', author.get_absolute_url()))
+
+        tag = Tag.objects.filter(faved=True).order_by('pk').first()
+        if tag:
+            urls.append(('view_tag', reverse('view_tag', args=[tag.slug])))
+            urls.append(('cite_tag', reverse('cite_tag', args=[tag.slug])))
+            urls.append(('print_tag', reverse('print_tag', args=[tag.slug])))
+
+        return urls
+
+    def time_url(self, client, url, repeat):
+        timings = []
+        num_queries = []
+        for i in range(repeat + 1):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url)
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                return {'status_code': response.status_code}
+            timings.append(elapsed)
+            num_queries.append(len(queries))
+
+        # The first request fills the caches (including the response cache,
+        # for the pages that use it).
+        result = {
+            'status_code': response.status_code,
+            'queries': num_queries[0],
+            'warm_queries': num_queries[-1],
+            'cold_ms': round(timings[0], 2),
+            'median_ms': round(statistics.median(timings[1:]), 2),
+            'min_ms': round(min(timings[1:]), 2),
+            'max_ms': round(max(timings[1:]), 2),
+        }
+        stats = getattr(response, 'request_stats', None)
+        if stats is not None:
+            result['sql_ms'] = stats.as_dict()['sql_ms']
+            result['template_ms'] = stats.as_dict()['template_ms']
+        return result
+
+    def get_revision(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        client = Client(HTTP_HOST='localhost')
+        if options['user']:
+            user = get_user_model().objects.filter(
+                username=options['user']
+            ).first()
+            if user is None:
+                raise CommandError('No such user: {}'.format(options['user']))
+            client.force_login(user)
+
+        results = {}
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            for name, url in self.get_urls():
+                try:
+                    results[name] = self.time_url(
+                        client, url, options['repeat']
+                    )
+                except Exception as e:
+                    results[name] = {'error': repr(e)}
+                self.stderr.write('{}: {}'.format(name, results[name]))
+
+        output = json.dumps({
+            'revision': self.get_revision(),
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'user': options['user'],
+            'repeat': options['repeat'],
+            'library': {
+                model.__name__: model.objects.count()
+                for model in (Book, Section, Note, TermOccurrence, Author,
+                              Tag, Action)
+            },
+            'views': results,
+        }, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
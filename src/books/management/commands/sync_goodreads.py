@@ -0,0 +1,44 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from goodreads_cache import sync
+
+
+class Command(BaseCommand):
+    help = (
+        'Fetches every page of the Goodreads read shelf concurrently, '
+        'reconciles the books against the database and stores the result, '
+        'which the /sync page then shows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=sync.MAX_WORKERS,
+                            help='Number of pages fetched at once')
+        parser.add_argument('--max-pages', type=int, default=sync.MAX_PAGES)
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            help="Don't request pages fetched less than this many minutes ago",
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if sync.is_running():
+            raise CommandError('A sync is already running')
+
+        max_age = None
+        if options['max_age'] is not None:
+            max_age = datetime.timedelta(minutes=options['max_age'])
+
+        try:
+            shelf_sync = sync.run_sync(
+                options['workers'], options['max_pages'], max_age
+            )
+        except Exception as e:
+            raise CommandError('Sync failed: {!r}'.format(e))
+
+        self.stdout.write('{} pages, {} books, {} to sync'.format(
+            shelf_sync.num_pages, shelf_sync.num_books, len(shelf_sync.books)
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from books import fulltext
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the stored full-text search vectors (Postgres only).'
+
+    def handle(self, *args, **options):
+        if not fulltext.is_enabled():
+            raise CommandError('Full-text search requires Postgres')
+
+        counts = fulltext.update_all_search_vectors()
+        for model_label, count in counts.items():
+            self.stdout.write('{}: {} rows updated'.format(model_label, count))
@@ -1,18 +1,20 @@
 from __future__ import unicode_literals
-import collections
 from datetime import date
 from heapq import merge
-import operator
 import re
 
 from django import forms
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 from languages.fields import LanguageField
 
 from activity.models import Action
+from . import citations, tagstats
+from .outline import SectionOutline
 from .utils import int_to_roman, roman_to_int
 
 
@@ -139,9 +141,18 @@ class Book(models.Model):
     completed_sections = models.BooleanField(default=False)  # KEEP
     completed_read = models.BooleanField(default=False)
     summary = models.TextField(blank=True)
+    # Rendered by a signal handler (see rendering.py)
+    summary_html = models.TextField(blank=True, editable=False)
     comments = models.TextField(blank=True)  # temporary private notes
     source_url = models.URLField(blank=True)
     slug = models.SlugField(unique=True)
+    # Maintained by signal handlers (see citations.py)
+    citation = models.TextField(blank=True, editable=False)
+    # Maintained by signal handlers (see counters.py)
+    num_notes = models.PositiveIntegerField(default=0, editable=False)
+    num_terms = models.PositiveIntegerField(default=0, editable=False)
+    # Only populated on Postgres (see fulltext.py)
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['title']
@@ -155,70 +166,25 @@ class Book(models.Model):
     def get_citation_data(self):
         details = self.details
         if details is None:
-            is_edited = False
-            issue_number = None
-            year = None
-            publisher = ''
-            authors = ''
-            num_authors = 0
-            title = self.title
+            default_author_names = []
         else:
-            if details.issue_number:
-                # It's a periodical. Set the title to the first author's name.
-                if details.default_authors.exists():
-                    title = details.default_authors.first().name
-                else:
-                    title = ''
-                authors = ''
-                num_authors = 0
-            else:
-                title = self.title
-                author_names = []
-                for author in details.default_authors.all():
-                    author_name = author.name.split(' ')
-                    last_name = ' '.join(author_name[1:])
-                    first_initial = author_name[0][0]
-                    author_names.append(
-                        '{last}, {first}.'.format(last=last_name, first=first_initial)
-                    )
-
-                # Join the names with commas and an "and" at the end.
-                authors = '?'
-                num_authors = len(author_names)
-                if num_authors == 1:
-                    authors = author_names[0]
-                elif num_authors == 2:
-                    authors = author_names[0] + ' and ' + author_names[1]
-                elif num_authors == 3:
-                    authors = (
-                        author_names[0] + ', ' + author_names[1] + ' and ' + author_names[2]
-                    )
-                elif num_authors > 3:
-                    authors = author_names[0] + ' et al'
-            is_edited = details.is_edited
-            issue_number = details.issue_number
-            year = details.year
-            publisher = details.publisher
-
-        return {
-            'is_edited': is_edited,
-            'issue_number': issue_number,
-            'num_authors': num_authors,
-            'authors': authors,
-            'year': year,
-            'title': title,
-            'publisher': publisher,
-        }
+            default_author_names = [
+                author.name for author in details.default_authors.all()
+            ]
+        return citations.get_book_data(
+            self.title,
+            citations.get_details_data(details),
+            default_author_names,
+        )
 
     def get_citation(self):
         """Streeck, W. (2016). _How will capitalism end? Essays on a failing
-        system._ New York: Verso Books."""
+        system._ New York: Verso Books.
 
-        citation_data = self.get_citation_data()
-        if citation_data:
-            return '{authors} ({year}). _{title}_. {publisher}.'.format(
-                **citation_data
-            )
+        Uses the stored citation if there is one."""
+        if self.citation:
+            return self.citation
+        return citations.format_book_citation(self.get_citation_data())
 
     def get_absolute_url(self):
         return reverse('view_book', args=[self.slug])
@@ -226,6 +192,11 @@ class Book(models.Model):
     def has_pages(self):
         return self.details.has_pages if self.details else False
 
+    @cached_property
+    def outline(self):
+        """Memoized for the lifetime of this instance (see outline.py)."""
+        return SectionOutline(self)
+
 
 class PageNumberField(models.PositiveSmallIntegerField):
     def validate(self, value, model_instance):
@@ -287,6 +258,7 @@ class Section(PageArtefact):
     title = models.CharField(max_length=255)
     subtitle = models.CharField(max_length=255, blank=True)
     summary = models.TextField(blank=True)
+    summary_html = models.TextField(blank=True, editable=False)
     rating = RatingField(default=0, blank=True)
     source_url = models.URLField(blank=True)
     related_to = models.ForeignKey('self', on_delete=models.CASCADE,
@@ -296,9 +268,19 @@ class Section(PageArtefact):
     date = models.DateField(blank=True, null=True)  # only publications
     has_tab = models.BooleanField(default=False,
         help_text='Does this section have one of those wide post-it tabs')
+    # Maintained by signal handlers (see citations.py)
+    citation = models.TextField(blank=True, editable=False)
+    # Maintained by signal handlers (see counters.py)
+    num_notes = models.PositiveIntegerField(default=0, editable=False)
+    num_terms = models.PositiveIntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['book__title', '-in_preface', 'page_number']
+        indexes = [
+            models.Index(fields=['book', '-in_preface', 'page_number', 'id'],
+                         name='section_book_page_idx'),
+        ]
 
     def __str__(self):
         return "{book} - {title}".format(
@@ -338,92 +320,58 @@ class Section(PageArtefact):
     def get_citation(self):
         """Gandy, O. H. (2009). Rational discrimination. In _Coming to terms
         with chance: Engaging rational discrimination and cumulative
-        disadvantage_. Farnham, VT: Ashgate, pp. 55-76."""
-        d = self.book.get_citation_data()
-        if not d:
-            return
-
-        author_names = []
-        for author in self.authors.all():
-            author_name = author.name.split(' ')
-            last_name = ' '.join(author_name[1:])
-            first_initial = author_name[0][0]
-            author_names.append(
-                '{last}, {first}.'.format(last=last_name, first=first_initial)
-            )
-
-        # Join the names with commas and an "and" at the end.
-        authors = '?'
-        if len(author_names) == 1:
-            authors = author_names[0]
-        elif len(author_names) == 2:
-            authors = author_names[0] + ' and ' + author_names[1]
-        elif len(author_names) == 3:
-            authors = (
-                author_names[0] + ', ' + author_names[1] + ' and ' + author_names[2]
-            )
-        elif len(author_names) > 3:
-            authors = author_names[0] + ' et al'
-
-        d['section_authors'] = authors
-        d['section_title'] = self.title
-        if d['issue_number']:
-            d['in'] = ''
-            d['publication'] = d['issue_number']
-            d['book_authors'] = ''
-            d['book_title'] = d['title'] + ','
-        else:
-            if self.book.details:
-                d['in'] = 'In '
-            else:
-                d['in'] = ''
-            d['publication'] = d['publisher']
-            d['book_authors'] = d['authors']
-            if d['is_edited']:
-                d['book_authors'] += ' (ed{})'.format('s' if d['num_authors'] > 1 else '')
-            d['book_title'] = d['title'] + '.'
-
-        if self.book.details:
-            d['ending'] = ', pp. {start}-{end}'.format(
-                start=self.page_number,
-                end=self.get_end_page()
-            )
-        else:
-            d['ending'] = self.source_url
-
-        if self.date:
-            d['year'] = self.date.strftime('%Y, %B %d')
-
-        return (
-            '{section_authors} ({year}). {section_title}. '
-            '{in}{book_authors} _{book_title}_ {publication}{ending}'
-        ).format(**d)
+        disadvantage_. Farnham, VT: Ashgate, pp. 55-76.
+
+        Uses the stored citation if there is one."""
+        if self.citation:
+            return self.citation
+        has_details = self.book.details is not None
+        return citations.format_section_citation(
+            self.book.get_citation_data(),
+            has_details,
+            self.title,
+            [author.name for author in self.authors.all()],
+            self.page_number,
+            self.get_end_page() if has_details else None,
+            self.source_url,
+            self.date,
+        )
 
     def get_end_page(self):
-        next_section = self.book.sections.filter(page_number__gt=self.page_number).order_by('page_number').first()
-        if next_section:
-            return next_section.page_number - 1
+        next_page_number = self.book.outline.get_next_page_number(
+            self.page_number
+        )
+        if next_page_number is not None:
+            return next_page_number - 1
         else:
             if self.book.details and self.book.details.num_pages:
                 return self.book.details.num_pages - 1
 
-    def get_next(self):
-        """Probably inefficient but the alternative is fairly complex so"""
-        found_next = False
-        for section in self.book.sections.all():
-            if found_next:
-                return section
+    def _get_neighbour(self, after):
+        """Sections are ordered by (-in_preface, page_number, pk) within a
+        book, so this is a range query on the section_book_page_idx index."""
+        lookup = 'gt' if after else 'lt'
+        neighbours = models.Q(in_preface=self.in_preface) & (
+            models.Q(**{'page_number__' + lookup: self.page_number}) |
+            models.Q(page_number=self.page_number,
+                     **{'pk__' + lookup: self.pk})
+        )
+        if self.in_preface == after:
+            # Crossing from the preface to the main text, or vice versa.
+            neighbours |= models.Q(in_preface=not self.in_preface)
 
-            if section.pk == self.pk:
-                found_next = True
+        sections = Section.objects.filter(book_id=self.book_id).filter(
+            neighbours
+        ).order_by('-in_preface', 'page_number', 'pk')
+        if not after:
+            sections = sections.reverse()
+        return sections.first()
 
-    def get_previous(self):
-        previous = None
-        for section in self.book.sections.all():
-            if section.pk == self.pk:
-                return previous
+    def get_next(self):
+        return self._get_neighbour(after=True)
 
-            previous = section
+    def get_previous(self):
+        return self._get_neighbour(after=False)
 
 
 class SectionArtefact(PageArtefact):
@@ -435,13 +383,24 @@ class SectionArtefact(PageArtefact):
     class Meta:
         abstract = True
 
-    def determine_section(self):
-        in_preface = self.in_preface
-        sections = self.book.sections.filter(
-            in_preface=in_preface,
-            page_number__lte=self.page_number,
+    def save(self, *args, **kwargs):
+        # The post_save handlers update the book's and section's counters
+        # (see counters.py), which have to be saved along with the artefact.
+        # (delete() already sends post_delete inside a transaction.)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def determine_section_id(self):
+        """Uses the book's section outline, so determining the section of
+        every artefact of a book only costs a single query."""
+        return self.book.outline.find_section_id(
+            self.in_preface, self.page_number
         )
-        return sections.last()
+
+    def determine_section(self):
+        section_id = self.determine_section_id()
+        if section_id is not None:
+            return Section.objects.get(pk=section_id)
 
     def has_default_authors(self):
         if self.section:
@@ -514,49 +473,20 @@ class Tag(models.Model):
             return ''
 
     def get_authors(self, limit=10):
-        author_ids = self.notes.values_list('authors__id', flat=True)
-        counter = collections.Counter(author_ids)
+        """Returns the authors in order of note count (descending), with a
+        limit. Each author has a num_notes attribute."""
+        return Author.objects.filter(notes__tags=self).annotate(
+            num_notes=models.Count('notes')
+        ).order_by('-num_notes', 'name')[:limit]
 
-        # Return the authors in order of note count (descending), with a limit
-        authors = []
-        for author_id, count in counter.most_common(limit):
-            if author_id is not None:
-                authors.append(Author.objects.get(pk=author_id))
-        return authors
+    def get_stats(self):
+        """Cached (see tagstats.py)."""
+        return tagstats.get_stats(self)
 
     def get_bibliography(self):
-        book_ids = set()
-        section_ids = set()
-        for note in self.notes.all().prefetch_related('section', 'book'):
-            if note.section_id:
-                section_ids.add(note.section_id)
-            else:
-                book_ids.add(note.book_id)
-
-        # Only include the section if the author is different from the book's
-        sections = Section.objects.filter(pk__in=section_ids).prefetch_related(
-            'authors'
-        )
-        books = Book.objects.filter(pk__in=book_ids).prefetch_related(
-            'details__default_authors'
-        )
-        entries = set()
-        for book in books:
-            entries.add(book)
-
-        for section in sections:
-            if section.has_default_authors():
-                entries.add(section.book)
-            else:
-                entries.add(section)
-
-        bibliography = []
-        for entry in entries:
-            citation = entry.get_citation()
-            if citation:
-                bibliography.append((citation, entry.get_absolute_url()))
-
-        return sorted(bibliography, key=operator.itemgetter(0))
+        """Returns a sorted list of (citation, url) pairs. Cached (see
+        citations.py)."""
+        return citations.get_tag_bibliography(self)
 
 
 class Note(SectionArtefact):
@@ -566,6 +496,11 @@ class Note(SectionArtefact):
     subject = models.CharField(max_length=100)
     quote = models.TextField()
     comment = models.TextField(blank=True)
+    # Rendered by a signal handler (see rendering.py)
+    quote_html = models.TextField(blank=True, editable=False)
+    comment_html = models.TextField(blank=True, editable=False)
+    # Maintained by signal handlers (see citations.py)
+    citation = models.TextField(blank=True, editable=False)
     hide_comment = models.BooleanField(default=False)
     section = models.ForeignKey(Section, on_delete=models.CASCADE,
         blank=True, null=True, related_name='notes')
@@ -573,9 +508,16 @@ class Note(SectionArtefact):
     # Will usually inherit from the Section, if present, or the book.
     authors = models.ManyToManyField(Author, blank=True, related_name='notes')
     tags = models.ManyToManyField(Tag, blank=True, related_name='notes')
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['-in_preface', 'page_number']
+        indexes = [
+            models.Index(fields=['book', 'in_preface', 'page_number'],
+                         name='note_book_page_idx'),
+            models.Index(fields=['book', 'added', 'id'],
+                         name='note_book_added_idx'),
+        ]
 
     @property
     def display_template(self):
@@ -592,25 +534,9 @@ class Note(SectionArtefact):
         return reverse('view_note', args=[str(self.id)])
 
     def get_citation(self):
-        author_names = []
-        for author in self.authors.all():
-            author_name = author.name.split(' ')
-            author_names.append(author_name[-1])  # last name only
-
-        # Join the names with commas and an "and" at the end.
-        authors = '?'
-        num_authors = len(author_names)
-        if num_authors == 1:
-            authors = author_names[0]
-        elif num_authors == 2:
-            authors = author_names[0] + ' and ' + author_names[1]
-        elif num_authors == 3:
-            authors = (
-                author_names[0] + ', ' + author_names[1] + ' and ' + author_names[2]
-            )
-        elif num_authors > 3:
-            authors = author_names[0] + ' et al'
-
+        """Uses the stored citation if there is one."""
+        if self.citation:
+            return self.citation
         if self.book.details:
             year = self.book.details.year
         else:
@@ -618,10 +544,10 @@ class Note(SectionArtefact):
                 year = self.section.date.year
             else:
                 year = '????'
-        return '({authors}, {year}, p.{page})'.format(
-            authors=authors,
-            year=year,
-            page=self.page_number
+        return citations.format_note_citation(
+            [author.name for author in self.authors.all()],
+            year,
+            self.page_number,
         )
 
     def __str__(self):
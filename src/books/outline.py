@@ -0,0 +1,69 @@
+"""The page boundaries of a book's sections, loaded in a single query.
+
+Use Book.outline rather than creating one directly: it's memoized on the book
+instance, so every section fetched through book.sections shares the same
+outline (e.g., when the citations of every section are rendered).
+"""
+import bisect
+
+
+class SectionOutline:
+    def __init__(self, book):
+        # (in_preface, page_number, pk) in the same order as the sections
+        # are displayed (preface first).
+        self.sections = list(
+            book.sections.order_by(
+                '-in_preface', 'page_number', 'pk'
+            ).values_list('in_preface', 'page_number', 'pk')
+        )
+        # Every distinct page number, ignoring in_preface, for get_end_page.
+        self.page_numbers = sorted(set(
+            page_number for _, page_number, _ in self.sections
+        ))
+        # The section boundaries for each part of the book, as parallel lists
+        # of page numbers and pks (sorted by page number and then pk), for
+        # find_section_id.
+        self.boundaries = {True: ([], []), False: ([], [])}
+        for in_preface, page_number, pk in self.sections:
+            page_numbers, pks = self.boundaries[in_preface]
+            page_numbers.append(page_number)
+            pks.append(pk)
+
+    def __len__(self):
+        return len(self.sections)
+
+    def get_next_page_number(self, page_number):
+        """Returns the smallest section page number that's greater than the
+        given one, or None."""
+        i = bisect.bisect_right(self.page_numbers, page_number)
+        if i < len(self.page_numbers):
+            return self.page_numbers[i]
+
+    def find_section_id(self, in_preface, page_number):
+        """Returns the pk of the section containing the given page (the last
+        one starting on or before it in the same part of the book), or None.
+        Same as SectionArtefact.determine_section, without a query."""
+        page_numbers, pks = self.boundaries[bool(in_preface)]
+        i = bisect.bisect_right(page_numbers, page_number)
+        if i > 0:
+            return pks[i - 1]
+
+
+def resolve_sections(book):
+    """Reassigns every note and term occurrence of the book to the section
+    containing its page. Returns a dict mapping each model to a list of the
+    artefacts whose section has changed, which still need to be saved (e.g.,
+    with bulk_update)."""
+    outline = book.outline
+    changed = {}
+    for artefacts in (book.notes, book.terms):
+        queryset = artefacts.only('in_preface', 'page_number', 'section')
+        changed[queryset.model] = []
+        for artefact in queryset:
+            section_id = outline.find_section_id(
+                artefact.in_preface, artefact.page_number
+            )
+            if artefact.section_id != section_id:
+                artefact.section_id = section_id
+                changed[queryset.model].append(artefact)
+    return changed
@@ -0,0 +1,138 @@
+"""Markdown rendering for the markdownify template filters.
+
+Rendering the same text twice is avoided with an in-process LRU, keyed on a
+hash of the text. Each thread reuses
+its own pre-configured Markdown instances (they aren't thread-safe), which
+are reset between conversions.
+
+Notes, sections and books also store the rendered HTML of their longer
+fields (see HTML_FIELDS), which is filled in by a pre_save signal handler
+and read by the markdownify_field filter.
+"""
+import collections
+import hashlib
+import re
+import threading
+
+from django.apps import apps
+import markdown
+
+
+# Only this many rendered texts are kept in memory at once.
+MAX_ENTRIES = 5000
+
+# For each model, the stored HTML field and the field it's rendered from.
+HTML_FIELDS = {
+    'books.Book': {'summary_html': 'summary'},
+    'books.Section': {'summary_html': 'summary'},
+    'books.Note': {'quote_html': 'quote', 'comment_html': 'comment'},
+}
+
+OL_REGEX = re.compile(r'([0-9]+)\. ')
+
+_rendered = collections.OrderedDict()
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_converter(name):
+    converter = getattr(_local, name, None)
+    if converter is None:
+        if name == 'text':
+            converter = markdown.Markdown(
+                extensions=['nl2br'], smart_emphasis=False
+            )
+        else:
+            converter = markdown.Markdown(smart_emphasis=False)
+        setattr(_local, name, converter)
+    return converter
+
+
+def convert(text, name='plain'):
+    """Same as markdown.markdown(text, smart_emphasis=False), or with the
+    nl2br extension if name is 'text'. Not cached."""
+    converter = _get_converter(name)
+    try:
+        return converter.convert(text)
+    finally:
+        converter.reset()
+
+
+def _render_text(text):
+    return convert(text, 'text').replace('    ', '&ensp;')
+
+
+def _render_title(text):
+    if OL_REGEX.match(text):
+        text = OL_REGEX.sub(r'\1\\. ', text)
+    output = convert(text)
+    if output.startswith('<p>') and output.endswith('</p>'):
+        output = output[3:-4]
+    if output.startswith('<h1>') and output.endswith('</h1>'):
+        output = output[4:-5]
+    return output
+
+
+RENDERERS = {
+    'text': _render_text,
+    'title': _render_title,
+}
+
+
+def render(text, kind='text'):
+    """Returns the HTML for the markdownify (kind='text') or
+    markdownify_title (kind='title') filter."""
+    if not text:
+        return ''
+
+    key = (kind, hashlib.sha1(text.encode('utf-8')).hexdigest())
+    with _lock:
+        html = _rendered.get(key)
+        if html is not None:
+            _rendered.move_to_end(key)
+            return html
+
+    html = RENDERERS[kind](text)
+
+    with _lock:
+        _rendered[key] = html
+        while len(_rendered) > MAX_ENTRIES:
+            _rendered.popitem(last=False)
+    return html
+
+
+def update_html_fields(instance):
+    """Connected to pre_save for the models in HTML_FIELDS."""
+    for html_field, field in HTML_FIELDS[instance._meta.label].items():
+        setattr(instance, html_field, render(getattr(instance, field)))
+
+
+def get_html(instance, field):
+    """Returns the stored HTML for the field if there is one (rows saved
+    before the HTML fields were added don't have it), else renders it."""
+    text = getattr(instance, field)
+    html_fields = HTML_FIELDS.get(instance._meta.label, {})
+    for html_field, source_field in html_fields.items():
+        if source_field == field:
+            html = getattr(instance, html_field)
+            if html or not text:
+                return html
+    return render(text)
+
+
+def update_all_html_fields():
+    """Fills in the stored HTML for every row. Returns a dict of model label
+    to number of rows updated."""
+    counts = {}
+    for label, html_fields in HTML_FIELDS.items():
+        model = apps.get_model(label)
+        fields = ['pk'] + list(html_fields.values())
+        instances = []
+        for instance in model.objects.only(*fields).iterator():
+            update_html_fields(instance)
+            instances.append(instance)
+        model.objects.bulk_update(
+            instances, list(html_fields), batch_size=500
+        )
+        counts[label] = len(instances)
+    return counts
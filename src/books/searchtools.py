@@ -1,8 +1,8 @@
 import re
 
-from django.db.models import Q, Count
+from django.db.models import F, Q
 
-from books import highlighter
+from books import bookindex, fulltext, highlighter
 from books.models import Book, Author, Note, Tag, Section
 from vocab.models import TermOccurrence
 
@@ -61,55 +61,27 @@ def search_within_book(query, book_id):
     except Book.DoesNotExist:
         raise BadQueryException
 
-    # todo: method on objectmanager to search by keyword
-    notes = book.notes.filter(
-        Q(subject__icontains=term) |
-        Q(quote__icontains=term) |
-        Q(comment__icontains=term)
-    )
-    terms = book.terms.filter(
-        Q(term__text__icontains=term) |
-        Q(term__definition__icontains=term) |
-        Q(quote__icontains=term) |
-        Q(quote__icontains=term)
-    )
-    sections = book.sections.filter(
-        Q(title__icontains=term) |
-        Q(authors__name__icontains=term) |
-        Q(subtitle__icontains=term) |
-        Q(summary__icontains=term)
-    )
-
-    results = {'notes': [], 'terms': [], 'sections': []}
-    for note in notes:
-        results['notes'].append({
-            'title': highlighter.highlight(note.subject, query),
-            'description': highlighter.highlight(note.quote, query, 200),
-            'price': note.get_page_display(),
-            'url': note.get_absolute_url(),
-        })
-
-    for term in terms:
-        results['terms'].append({
-            'title': highlighter.highlight(term.term.text, query),
-            'description': highlighter.highlight(term.quote, query, 200),
-            'price': term.get_page_display(),
-            'url': term.get_absolute_url(),
-        })
-
-    for section in sections:
-        authors = ', '.join(a.name for a in section.authors.all())
-        results['sections'].append({
-            'title': highlighter.highlight(section.title, query),
-            'description': highlighter.highlight(authors, query),
-            'price': section.get_page_display(),
-            'url': section.get_absolute_url(),
-        })
+    matches = bookindex.get_index(book).search(query)
+
+    # Only the notes and terms have long descriptions that need truncating.
+    truncate_to = {'notes': 200, 'terms': 200, 'sections': None}
+    results = {}
+    for kind, entries in matches.items():
+        results[kind] = [
+            {
+                'title': highlighter.highlight(entry['title'], query),
+                'description': highlighter.highlight(
+                    entry['description'], query, truncate_to[kind]
+                ),
+                'price': entry['price'],
+                'url': entry['url'],
+            }
+            for entry in entries
+        ]
 
     return results
 
 
-
 def get_search_results(query='', mode='', sort='', filter_form=None):
     """
     Used by bookmarker.views.search.
@@ -120,6 +92,14 @@ def get_search_results(query='', mode='', sort='', filter_form=None):
 
     if mode and sort in SORTS[mode]:
         ORDERING[mode] = sort
+        custom_sort = True
+    else:
+        custom_sort = False
+
+    # On Postgres, use the stored search vectors (and rank the results unless
+    # a custom sort was chosen). Otherwise, use regular expressions.
+    use_fulltext = fulltext.is_enabled()
+    search_query = fulltext.get_query(query) if use_fulltext else None
 
     # Split out the meta options. TODO
     term = re.escape(query)
@@ -128,27 +108,39 @@ def get_search_results(query='', mode='', sort='', filter_form=None):
         query = term.strip('"')
         term = r'\y{}\y'.format(query)
 
-    notes = Note.objects.filter(
-        Q(subject__iregex=term) |
-        Q(quote__iregex=term) |
-        Q(comment__iregex=term)
-    )
-    terms = TermOccurrence.objects.filter(
-        Q(term__text__iregex=term) |
-        Q(term__definition__iregex=term) |
-        Q(quote__iregex=term) |
-        Q(quote__iregex=term)
-    )
-    sections = Section.objects.filter(
-        Q(title__iregex=term) |
-        Q(subtitle__iregex=term) |
-        Q(summary__iregex=term)
-    )
-    books = Book.objects.filter(
-        Q(title__iregex=term) |
-        Q(summary__iregex=term) |
-        Q(details__authors__name__iregex=term)
-    )
+    if use_fulltext:
+        notes = Note.objects.filter(search_vector=search_query)
+        terms = TermOccurrence.objects.filter(
+            Q(search_vector=search_query) |
+            Q(term__search_vector=search_query)
+        )
+        sections = Section.objects.filter(search_vector=search_query)
+        books = Book.objects.filter(
+            Q(search_vector=search_query) |
+            Q(details__authors__name__iregex=term)
+        )
+    else:
+        notes = Note.objects.filter(
+            Q(subject__iregex=term) |
+            Q(quote__iregex=term) |
+            Q(comment__iregex=term)
+        )
+        terms = TermOccurrence.objects.filter(
+            Q(term__text__iregex=term) |
+            Q(term__definition__iregex=term) |
+            Q(quote__iregex=term) |
+            Q(quote__iregex=term)
+        )
+        sections = Section.objects.filter(
+            Q(title__iregex=term) |
+            Q(subtitle__iregex=term) |
+            Q(summary__iregex=term)
+        )
+        books = Book.objects.filter(
+            Q(title__iregex=term) |
+            Q(summary__iregex=term) |
+            Q(details__authors__name__iregex=term)
+        )
 
     # Add the sections where the author name matches BUT the associated books
     # not already in the books queryset above.
@@ -225,13 +217,6 @@ def get_search_results(query='', mode='', sort='', filter_form=None):
                         filters[filter_field] = filter_form.cleaned_data[filter_key]
                         filters_dict[filter_key] = filter_form.data[filter_key]
 
-        # If sections, show the term/note counts.
-        if mode == 'sections':
-            results[mode] = results[mode].annotate(
-                num_terms=Count('terms', distinct=True),
-                num_notes=Count('notes', distinct=True),
-            )
-
         if filters:
             # Make sure to prefetch again for the filtered queryset.
             results[mode] = results[mode].filter(
@@ -245,6 +230,11 @@ def get_search_results(query='', mode='', sort='', filter_form=None):
         results['sections'] = results['sections'].select_related('book')
 
     for key in results:
-        results[key] = results[key].order_by(ORDERING[key]).distinct()
+        if use_fulltext and not custom_sort:
+            results[key] = results[key].annotate(
+                rank=fulltext.get_rank(search_query, include_term=key == 'terms')
+            ).order_by(F('rank').desc(), ORDERING[key]).distinct()
+        else:
+            results[key] = results[key].order_by(ORDERING[key]).distinct()
 
     return results, filters_dict
@@ -0,0 +1,45 @@
+"""The book "shelves" shown on the dashboard (see admin_tools.html) and on the
+view_books pages. A book can be on more than one shelf."""
+from django.db.models import Count, F, Q
+
+from books.models import Book
+
+
+SHELVES = {
+    'new': Q(
+        is_processed=False,
+        completed_sections=False,
+        completed_read=True,
+        details__isnull=False,
+    ),
+    'incomplete': Q(completed_sections=True, is_processed=False),
+    'unread': Q(completed_read=False, is_ignored=False),
+    'publications': Q(details__isnull=True),
+    'complete': Q(is_processed=True, is_ignored=False),
+    'ignored': Q(is_ignored=True),
+}
+DEFAULT_ORDERING = ('is_processed', 'completed_sections', '-pk')
+ORDERINGS = {
+    'new': ('-details__end_date',),
+    'unread': (
+        F('details__due_date').asc(nulls_last=True),
+        F('details__priority').asc(nulls_last=True),
+    ),
+}
+
+
+def get_counts():
+    """Returns a dict of shelf name to number of books, computed in a single
+    query (one conditional COUNT per shelf)."""
+    return Book.objects.aggregate(**{
+        shelf: Count('pk', filter=condition)
+        for shelf, condition in SHELVES.items()
+    })
+
+
+def get_books(shelf):
+    return Book.objects.filter(SHELVES[shelf]).order_by(
+        *ORDERINGS.get(shelf, DEFAULT_ORDERING)
+    ).select_related('details').prefetch_related(
+        'details__authors', 'details__goals'
+    )
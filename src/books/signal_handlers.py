@@ -1,7 +1,13 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import m2m_changed, post_delete, post_init, \
+                                     post_save, pre_delete, pre_save
+from django.db.models import Q
 from django.dispatch import receiver
 
-from books.models import Book, BookDetails
+from books import author_books, bookindex, citations, counters, \
+                  dataversions, fulltext, rendering, tagstats, typeahead
+from books.models import Author, Book, BookDetails, Note, Section, Tag, \
+                         TagCategory
+from vocab import highlighting
 
 
 @receiver(post_delete, sender=Book)
@@ -11,3 +17,356 @@ def delete_related_book_details(sender, instance, **kwargs):
         details = BookDetails.objects.filter(pk=instance.details_id).first()
         if details:
             details.delete()
+
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=Section)
+@receiver(pre_save, sender=Note)
+def update_html_fields(sender, instance, **kwargs):
+    rendering.update_html_fields(instance)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender='vocab.Term')
+@receiver(post_save, sender='vocab.TermOccurrence')
+def update_search_vector(sender, instance, **kwargs):
+    fulltext.update_search_vector(instance)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_suggestions(sender, **kwargs):
+    typeahead.invalidate('books')
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def invalidate_author_suggestions(sender, **kwargs):
+    typeahead.invalidate('authors')
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def invalidate_section_suggestions(sender, **kwargs):
+    typeahead.invalidate('sections')
+
+
+@receiver(post_save, sender='vocab.Term')
+@receiver(post_delete, sender='vocab.Term')
+def invalidate_term_suggestions(sender, **kwargs):
+    typeahead.invalidate('terms')
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender='vocab.TermOccurrence')
+@receiver(post_delete, sender='vocab.TermOccurrence')
+def invalidate_book_index(sender, instance, **kwargs):
+    bookindex.invalidate(instance.book_id)
+
+
+@receiver(m2m_changed, sender=Section.authors.through)
+def invalidate_book_index_for_section_authors(sender, instance, **kwargs):
+    # The reverse side (author.sections.add) can affect several books.
+    if isinstance(instance, Section):
+        bookindex.invalidate(instance.book_id)
+    else:
+        bookindex.invalidate()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender='vocab.Term')
+def invalidate_all_book_indexes(sender, **kwargs):
+    # Author names and term definitions can appear in several books.
+    bookindex.invalidate()
+
+
+@receiver(post_save, sender='vocab.TermOccurrence')
+@receiver(post_delete, sender='vocab.TermOccurrence')
+def invalidate_highlighted_quote(sender, instance, **kwargs):
+    highlighting.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=BookDetails)
+@receiver(post_delete, sender=BookDetails)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(m2m_changed, sender=Section.authors.through)
+@receiver(m2m_changed, sender=BookDetails.authors.through)
+@receiver(m2m_changed, sender=BookDetails.default_authors.through)
+def invalidate_author_books(sender, **kwargs):
+    author_books.invalidate()
+
+
+def invalidate_tag_caches(tag_ids):
+    tag_ids = list(tag_ids)
+    tagstats.invalidate(tag_ids)
+    citations.invalidate(tag_ids)
+    dataversions.bump(
+        dataversions.tag(slug)
+        for slug in Tag.objects.filter(pk__in=tag_ids).values_list(
+            'slug', flat=True
+        )
+    )
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def invalidate_tag_caches_for_tagging(sender, instance, action, reverse,
+                                      pk_set, **kwargs):
+    if reverse:
+        # tag.notes.add(...) etc
+        invalidate_tag_caches([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_tag_caches(instance.tags.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_tag_caches(pk_set)
+
+
+@receiver(m2m_changed, sender=Note.authors.through)
+def invalidate_tag_stats_for_note_authors(sender, instance, action, reverse,
+                                          **kwargs):
+    if not action.startswith('post_'):
+        return
+
+    if reverse:
+        # author.notes.add(...) etc, which can affect any tag.
+        tagstats.invalidate_all()
+    else:
+        tagstats.invalidate(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Note)
+@receiver(pre_delete, sender=Note)
+def invalidate_tag_caches_for_note(sender, instance, **kwargs):
+    # New notes aren't tagged yet.
+    if not kwargs.get('created'):
+        invalidate_tag_caches(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def invalidate_all_tag_stats(sender, **kwargs):
+    tagstats.invalidate_all()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=BookDetails)
+@receiver(post_delete, sender=BookDetails)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(m2m_changed, sender=Section.authors.through)
+@receiver(m2m_changed, sender=BookDetails.default_authors.through)
+def invalidate_all_bibliographies(sender, **kwargs):
+    # Any of these can change the citations of several tags.
+    citations.invalidate_all()
+
+
+@receiver(post_save, sender=Book)
+def update_book_citations(sender, instance, **kwargs):
+    citations.update_citations([instance.pk], include_notes=False)
+
+
+@receiver(post_save, sender=BookDetails)
+def update_details_citations(sender, instance, **kwargs):
+    # The notes include the year.
+    book_ids = Book.objects.filter(details=instance).values_list('pk', flat=True)
+    citations.update_citations(book_ids)
+
+
+def _get_reverse_pk_set(sender, instance, action, model, pk_set, field_name):
+    """For the reverse side of an m2m_changed (e.g., author.notes.add(...)).
+    Django doesn't give a pk_set for clear, so the pks are remembered on
+    pre_clear and returned on post_clear. field_name is the name of the
+    ManyToManyField on model."""
+    if action == 'pre_clear':
+        cleared = getattr(instance, '_cleared_pks', {})
+        cleared[sender] = set(model.objects.filter(
+            **{field_name: instance}
+        ).values_list('pk', flat=True))
+        instance._cleared_pks = cleared
+    elif action == 'post_clear':
+        return getattr(instance, '_cleared_pks', {}).pop(sender, set())
+    return pk_set
+
+
+@receiver(m2m_changed, sender=BookDetails.default_authors.through)
+def update_default_author_citations(sender, instance, action, reverse, model,
+                                    pk_set, **kwargs):
+    if reverse:
+        pk_set = _get_reverse_pk_set(sender, instance, action, model, pk_set,
+                                     'default_authors')
+    if not action.startswith('post_'):
+        return
+
+    if reverse:
+        # author.default_books.add(...) etc
+        books = Book.objects.filter(details__in=pk_set)
+    else:
+        books = Book.objects.filter(details=instance)
+    citations.update_citations(
+        books.values_list('pk', flat=True), include_notes=False
+    )
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def update_section_citations(sender, instance, **kwargs):
+    # Every section in the book, since the end pages depend on the others.
+    citations.update_citations([instance.book_id], include_notes=False)
+    if kwargs.get('created') is False:
+        # The notes of publications include the section's date.
+        citations.update_note_citations(
+            instance.notes.values_list('pk', flat=True)
+        )
+
+
+@receiver(m2m_changed, sender=Section.authors.through)
+def update_section_author_citations(sender, instance, action, reverse, model,
+                                    pk_set, **kwargs):
+    if reverse:
+        pk_set = _get_reverse_pk_set(sender, instance, action, model, pk_set,
+                                     'authors')
+    if not action.startswith('post_'):
+        return
+
+    if reverse:
+        # author.sections.add(...) etc
+        book_ids = Section.objects.filter(pk__in=pk_set).values_list(
+            'book_id', flat=True
+        )
+    else:
+        book_ids = [instance.book_id]
+    citations.update_citations(set(book_ids), include_notes=False)
+
+
+@receiver(post_save, sender=Note)
+def update_note_citation(sender, instance, **kwargs):
+    citations.update_note_citations([instance.pk])
+
+
+@receiver(m2m_changed, sender=Note.authors.through)
+def update_note_author_citations(sender, instance, action, reverse, model,
+                                 pk_set, **kwargs):
+    if reverse:
+        pk_set = _get_reverse_pk_set(sender, instance, action, model, pk_set,
+                                     'authors')
+    if not action.startswith('post_'):
+        return
+
+    if reverse:
+        # author.notes.add(...) etc
+        citations.update_note_citations(pk_set)
+    else:
+        citations.update_note_citations([instance.pk])
+
+
+def _get_author_book_ids(author):
+    return list(Book.objects.filter(
+        Q(details__default_authors=author) |
+        Q(sections__authors=author) |
+        Q(notes__authors=author)
+    ).values_list('pk', flat=True).distinct())
+
+
+@receiver(post_save, sender=Author)
+def update_author_citations(sender, instance, created, **kwargs):
+    if created:
+        return
+
+    citations.update_citations(_get_author_book_ids(instance))
+
+
+@receiver(pre_delete, sender=Author)
+def remember_author_books(sender, instance, **kwargs):
+    # Deleting the author clears the m2m rows without sending m2m_changed,
+    # so the books have to be found before they're gone.
+    instance._citation_book_ids = _get_author_book_ids(instance)
+
+
+@receiver(post_delete, sender=Author)
+def update_deleted_author_citations(sender, instance, **kwargs):
+    citations.update_citations(getattr(instance, '_citation_book_ids', []))
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=BookDetails)
+@receiver(post_delete, sender=BookDetails)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=TagCategory)
+@receiver(post_delete, sender=TagCategory)
+@receiver(post_save, sender='vocab.Term')
+@receiver(post_delete, sender='vocab.Term')
+@receiver(m2m_changed, sender=Section.authors.through)
+@receiver(m2m_changed, sender=BookDetails.authors.through)
+@receiver(m2m_changed, sender=BookDetails.default_authors.through)
+def bump_global_data_version(sender, **kwargs):
+    # These are shown on many pages, and edited far less often than notes.
+    if kwargs.get('action', 'post_').startswith('post_'):
+        dataversions.bump([dataversions.GLOBAL])
+
+
+# These have to be connected before update_counters_on_save, which replaces
+# the location the artefact was loaded with.
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+@receiver(post_save, sender='vocab.TermOccurrence')
+@receiver(post_delete, sender='vocab.TermOccurrence')
+def bump_artefact_data_versions(sender, instance, **kwargs):
+    kind = dataversions.NOTES if sender is Note else dataversions.TERMS
+    dataversions.bump_for_artefact(kind, instance.book_id, instance.section_id)
+
+    # If it's been moved, its old book and section have changed too.
+    old_location = getattr(instance, '_counted_location', None)
+    if old_location not in (None, (instance.book_id, instance.section_id)):
+        dataversions.bump_for_artefact(kind, *old_location)
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+@receiver(m2m_changed, sender=Note.authors.through)
+def bump_note_data_versions(sender, instance, action, reverse, **kwargs):
+    # The tags and authors are shown with the notes.
+    if not action.startswith('post_'):
+        return
+
+    if reverse:
+        # tag.notes.add(...) etc, which can affect any book.
+        dataversions.bump([dataversions.GLOBAL])
+    else:
+        dataversions.bump_for_artefact(
+            dataversions.NOTES, instance.book_id, instance.section_id
+        )
+
+
+@receiver(post_init, sender=Note)
+@receiver(post_init, sender='vocab.TermOccurrence')
+def remember_artefact_location(sender, instance, **kwargs):
+    counters.remember_location(instance)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender='vocab.TermOccurrence')
+def update_counters_on_save(sender, instance, created, **kwargs):
+    counters.artefact_saved(instance, created)
+
+
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender='vocab.TermOccurrence')
+def update_counters_on_delete(sender, instance, **kwargs):
+    counters.artefact_deleted(instance)
@@ -0,0 +1,57 @@
+"""Per-tag statistics shown on view_tag: the number of notes and books, the
+date range of the notes, and the authors with the most notes.
+
+They're kept in the shared cache. The signal handlers drop a tag's entry
+whenever notes are tagged or untagged (or a tagged note is edited or
+deleted), and every entry when an author is edited, since the author names
+are included.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Min
+
+
+CACHE_PREFIX = 'books:tag_stats'
+GENERATION_KEY = CACHE_PREFIX + ':generation'
+NUM_AUTHORS = 10
+
+
+def _get_key(tag_id):
+    # Bumping the generation invalidates every tag at once. It starts from
+    # the time, so that a generation that's been evicted from the cache
+    # doesn't come back with a value it's already had.
+    generation = cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+    return '{}:{}:{}'.format(CACHE_PREFIX, generation, tag_id)
+
+
+def _compute_stats(tag):
+    stats = tag.notes.aggregate(
+        num_notes=Count('pk'),
+        num_books=Count('book', distinct=True),
+        first_added=Min('added'),
+        last_added=Max('added'),
+    )
+    stats['authors'] = [
+        {'name': author.name, 'slug': author.slug, 'num_notes': author.num_notes}
+        for author in tag.get_authors(NUM_AUTHORS)
+    ]
+    return stats
+
+
+def get_stats(tag):
+    """Returns a dict with num_notes, num_books, first_added, last_added and
+    authors (a list of dicts with name, slug and num_notes)."""
+    return cache.get_or_set(_get_key(tag.pk), lambda: _compute_stats(tag), None)
+
+
+def invalidate(tag_ids):
+    cache.delete_many([_get_key(tag_id) for tag_id in tag_ids])
+
+
+def invalidate_all():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # The generation isn't set yet, so nothing has been cached.
+        pass
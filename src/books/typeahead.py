@@ -0,0 +1,183 @@
+"""Autocomplete suggestions for search_json and suggest_terms.
+
+On Postgres, the icontains lookups are served by pg_trgm GIN indexes (created
+after migrating, like the full-text ones) and ranked by trigram similarity.
+On SQLite, each category gets an in-process index of word suffixes (so that,
+like icontains, any substring matches), built on first use and thrown away
+by the signal handlers whenever the underlying model changes.
+"""
+import bisect
+import threading
+
+from django.apps import apps
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection, connections
+from django.urls import reverse
+
+
+# Maximum number of suggestions returned per category.
+LIMITS = {
+    'books': 5,
+    'authors': 5,
+    'sections': 5,
+    'terms': 5,
+}
+
+CATEGORIES = {
+    'books': {
+        'model': 'books.Book',
+        'field': 'title',
+        'values': ('title', 'slug'),
+        'format': lambda row: {
+            'title': row['title'],
+            'url': reverse('view_book', args=[row['slug']]),
+        },
+    },
+    'authors': {
+        'model': 'books.Author',
+        'field': 'name',
+        'values': ('name', 'slug'),
+        'format': lambda row: {
+            'title': row['name'],
+            'url': reverse('view_author', args=[row['slug']]),
+        },
+    },
+    'sections': {
+        'model': 'books.Section',
+        'field': 'title',
+        'values': ('title', 'pk'),
+        'format': lambda row: {
+            'title': row['title'],
+            'url': reverse('view_section', args=[str(row['pk'])]),
+        },
+    },
+    'terms': {
+        'model': 'vocab.Term',
+        'field': 'text',
+        'values': ('text', 'language'),
+        'format': lambda row: {
+            'text': row['text'],
+            'language': row['language'],
+        },
+    },
+}
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+class SubstringIndex:
+    """Sorted (suffix, entry) pairs for every suffix of every word, so that
+    every entry with a word containing a given string can be found by
+    bisection."""
+    def __init__(self, rows):
+        # rows is a list of (text, result) tuples
+        self.entries = []
+        self.words = []
+        for text, result in rows:
+            entry_id = len(self.entries)
+            text = text.lower()
+            self.entries.append((text, result))
+            suffixes = set(
+                word[i:] for word in text.split() for i in range(len(word))
+            )
+            for suffix in suffixes:
+                self.words.append((suffix, entry_id))
+        self.words.sort()
+
+    def _find_prefix(self, prefix):
+        entry_ids = set()
+        i = bisect.bisect_left(self.words, (prefix,))
+        while i < len(self.words) and self.words[i][0].startswith(prefix):
+            entry_ids.add(self.words[i][1])
+            i += 1
+        return entry_ids
+
+    def search(self, query, limit):
+        """Returns the results of the entries containing the query, like
+        icontains."""
+        query = query.lower()
+        query_words = query.split()
+        if not query_words:
+            return []
+
+        # Every query word has to be in some word of the entry.
+        entry_ids = None
+        for query_word in sorted(query_words, key=len, reverse=True):
+            found = self._find_prefix(query_word)
+            entry_ids = found if entry_ids is None else entry_ids & found
+            if not entry_ids:
+                return []
+
+        # Entries starting with the query come first, then shorter entries.
+        matches = sorted(
+            (self.entries[entry_id] for entry_id in entry_ids
+             if query in self.entries[entry_id][0]),
+            key=lambda entry: (not entry[0].startswith(query), len(entry[0]),
+                               entry[0])
+        )
+        return [result for text, result in matches[:limit]]
+
+
+def is_enabled():
+    """Whether trigram indexes are available."""
+    return connection.vendor == 'postgresql'
+
+
+def _get_index(category):
+    index = _indexes.get(category)
+    if index is None:
+        with _lock:
+            index = _indexes.get(category)
+            if index is None:
+                config = CATEGORIES[category]
+                model = apps.get_model(config['model'])
+                rows = model.objects.values(*config['values'])
+                index = SubstringIndex(
+                    (row[config['field']], config['format'](row))
+                    for row in rows.iterator()
+                )
+                _indexes[category] = index
+    return index
+
+
+def invalidate(category):
+    _indexes.pop(category, None)
+
+
+def suggest(category, query, limit=None):
+    """Returns a list of at most LIMITS[category] dicts, in the format
+    expected by the frontend (see CATEGORIES)."""
+    if limit is None:
+        limit = LIMITS[category]
+
+    if not is_enabled():
+        return _get_index(category).search(query, limit)
+
+    config = CATEGORIES[category]
+    field = config['field']
+    model = apps.get_model(config['model'])
+    rows = model.objects.filter(
+        **{field + '__icontains': query}
+    ).annotate(
+        similarity=TrigramSimilarity(field, query)
+    ).order_by('-similarity', field).values(*config['values'])[:limit]
+    return [config['format'](row) for row in rows]
+
+
+def create_trigram_indexes(using='default', **kwargs):
+    """Connected to post_migrate in BooksConfig. The indexes are on the
+    expression that Django's icontains lookup uses on Postgres."""
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+
+    with db.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for config in CATEGORIES.values():
+            table = apps.get_model(config['model'])._meta.db_table
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS {table}_{field}_trgm '
+                'ON {table} USING gin ((UPPER({field}::text)) gin_trgm_ops)'
+                .format(table=table, field=config['field'])
+            )
@@ -1,3 +1,15 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import FeedPage, ShelfSync
+
+
+@admin.register(FeedPage)
+class FeedPageAdmin(admin.ModelAdmin):
+    list_display = ['url', 'fetched_at', 'changed_at']
+    readonly_fields = ['etag', 'last_modified', 'fetched_at', 'changed_at']
+
+
+@admin.register(ShelfSync)
+class ShelfSyncAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'finished_at', 'num_pages', 'num_books']
+    exclude = ['books']
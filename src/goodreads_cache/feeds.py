@@ -0,0 +1,75 @@
+"""Cached fetching of Goodreads pages (the RSS feed used by /sync).
+
+Each URL's last response is stored as a FeedPage, along with its ETag and
+Last-Modified headers, so refreshing it is a conditional request (and
+Goodreads usually just answers with a 304).
+
+Requests share a single requests.Session, whose connection pool is big
+enough for the threads that sync.py fetches the pages with.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.utils import timezone
+
+from .models import FeedPage
+
+
+TIMEOUT = 10  # seconds
+POOL_SIZE = 16
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE
+            )
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def fetch(url, headers=None, cookies=None, max_age=None):
+    """Fetches the URL (conditionally, if it's been fetched before), stores
+    the response and returns the FeedPage. If the stored copy is younger
+    than max_age, it's returned without making a request."""
+    page = FeedPage.objects.filter(url=url).first()
+    now = timezone.now()
+    if page is not None and max_age is not None:
+        if now - page.fetched_at <= max_age:
+            return page
+
+    headers = dict(headers or {})
+    if page is not None:
+        if page.etag:
+            headers['If-None-Match'] = page.etag
+        if page.last_modified:
+            headers['If-Modified-Since'] = page.last_modified
+
+    response = get_session().get(url, headers=headers, cookies=cookies,
+                                 timeout=TIMEOUT)
+    now = timezone.now()
+    if page is not None and response.status_code == 304:
+        page.fetched_at = now
+        page.save(update_fields=['fetched_at'])
+        return page
+
+    response.raise_for_status()
+    content = response.content.decode()
+    if page is None:
+        page = FeedPage(url=url, changed_at=now)
+    elif page.content != content:
+        page.changed_at = now
+    page.content = content
+    page.etag = response.headers.get('ETag', '')
+    page.last_modified = response.headers.get('Last-Modified', '')
+    page.fetched_at = now
+    page.save()
+    return page
@@ -1,3 +1,37 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class FeedPage(models.Model):
+    """The last response for a Goodreads URL (see feeds.py)."""
+    url = models.URLField(max_length=500, unique=True)
+    content = models.TextField()
+    # Sent back as If-None-Match and If-Modified-Since when refreshing.
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=255, blank=True)
+    # When the content was last confirmed to be current (including by a 304).
+    fetched_at = models.DateTimeField()
+    # When the content last changed.
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.url
+
+
+class ShelfSync(models.Model):
+    """A run of sync.run_sync over the whole read shelf. /sync shows the
+    books of the latest successful one."""
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    num_pages = models.PositiveIntegerField(default=0)
+    num_books = models.PositiveIntegerField(default=0)
+    # The books that still need to be added or processed, as returned by
+    # goodreadstools.reconcile.
+    books = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return 'Sync started {}'.format(self.started_at)
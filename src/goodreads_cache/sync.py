@@ -0,0 +1,140 @@
+"""Syncing the whole read shelf at once, for the sync_goodreads command and
+the /sync page.
+
+The RSS pages are fetched (see feeds.py) and parsed by a bounded thread pool,
+a batch of pages at a time, until a page comes back empty. The books are
+then reconciled against the database once, and the result is stored as a
+ShelfSync, which is all the page has to display.
+"""
+import concurrent.futures
+import datetime
+import logging
+import threading
+
+from django.db import connections
+from django.utils import timezone
+
+from books import goodreadstools
+from .models import ShelfSync
+
+
+MAX_WORKERS = 8
+MAX_PAGES = 200
+# A sync that hasn't finished after this long is assumed to have died.
+TIMEOUT = datetime.timedelta(minutes=30)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_thread = None
+
+
+def _fetch_and_parse(page, max_age):
+    try:
+        feed_page = goodreadstools.fetch_page(page, max_age=max_age)
+        return list(goodreadstools._iter_items(feed_page.content))
+    finally:
+        # Each thread has its own database connection.
+        connections.close_all()
+
+
+def fetch_shelf(max_workers=MAX_WORKERS, max_pages=MAX_PAGES, max_age=None):
+    """Returns the number of pages and the list of book dicts (see
+    goodreadstools._iter_items) on the whole shelf, without duplicates."""
+    books = []
+    seen_ids = set()
+    num_pages = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        while num_pages < max_pages:
+            pages = range(
+                num_pages + 1, min(num_pages + max_workers, max_pages) + 1
+            )
+            results = executor.map(
+                lambda page: _fetch_and_parse(page, max_age), pages
+            )
+            for items in results:
+                if not items:
+                    return num_pages, books
+                num_pages += 1
+                # A book can move to the next page if one is added while
+                # we're fetching.
+                for item in items:
+                    if item['id'] not in seen_ids:
+                        seen_ids.add(item['id'])
+                        books.append(item)
+    return num_pages, books
+
+
+def run_sync(max_workers=MAX_WORKERS, max_pages=MAX_PAGES, max_age=None):
+    """Fetches and reconciles the whole shelf, and returns the (saved)
+    ShelfSync. If it fails, the error is saved too, then re-raised."""
+    shelf_sync = ShelfSync.objects.create()
+    try:
+        num_pages, books = fetch_shelf(max_workers, max_pages, max_age)
+        shelf_sync.num_pages = num_pages
+        shelf_sync.num_books = len(books)
+        shelf_sync.books = goodreadstools.reconcile(books)
+    except Exception as e:
+        shelf_sync.error = repr(e)
+        raise
+    finally:
+        shelf_sync.finished_at = timezone.now()
+        shelf_sync.save()
+    return shelf_sync
+
+
+def _get_running():
+    return ShelfSync.objects.filter(
+        finished_at=None, started_at__gt=timezone.now() - TIMEOUT
+    )
+
+
+def is_running():
+    return _get_running().exists()
+
+
+async def ais_running():
+    return await _get_running().aexists()
+
+
+def _get_successful():
+    return ShelfSync.objects.exclude(finished_at=None).filter(error='')
+
+
+def get_latest():
+    """The latest successful ShelfSync, or None. Failed ones have no books,
+    so they'd empty the list on /sync until the next successful one."""
+    return _get_successful().first()
+
+
+async def aget_latest():
+    return await _get_successful().afirst()
+
+
+async def aget_latest_failure(latest):
+    """The latest failed ShelfSync since latest (the latest successful one,
+    or None), or None."""
+    failures = ShelfSync.objects.exclude(finished_at=None).exclude(error='')
+    if latest is not None:
+        failures = failures.filter(started_at__gt=latest.started_at)
+    return await failures.afirst()
+
+
+def _run_in_background():
+    try:
+        run_sync()
+    except Exception:
+        logger.exception('Could not sync the Goodreads shelf')
+    finally:
+        connections.close_all()
+
+
+def start_in_background():
+    """Returns False if a sync is already running."""
+    global _thread
+    with _lock:
+        if (_thread is not None and _thread.is_alive()) or is_running():
+            return False
+        _thread = threading.Thread(target=_run_in_background, daemon=True)
+        _thread.start()
+    return True
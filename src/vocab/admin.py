@@ -3,7 +3,7 @@ from django.contrib import admin, messages
 from django.utils.html import format_html
 
 from books.models import Author
-from .models import TermCategory, Term, TermOccurrence
+from .models import Definition, TermCategory, Term, TermOccurrence
 
 
 def flag_terms(modeladmin, request, queryset):
@@ -49,3 +49,10 @@ class TermOccurrenceAdmin(admin.ModelAdmin):
 class TermCategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'description', 'confidence')
     order_by = ['number']
+
+
+@admin.register(Definition)
+class DefinitionAdmin(admin.ModelAdmin):
+    list_display = ('text', 'language', 'found', 'fetched_at')
+    list_filter = ('language', 'found')
+    search_fields = ['text']
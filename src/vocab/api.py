@@ -6,6 +6,8 @@ DICTIONARY = CollegiateDictionary('d59bdd56-d417-42d7-906e-6804b3069c90')
 
 
 def lookup_term(language, term):
+    """Returns the definition and whether the term was found. If it wasn't,
+    the definition is the dictionary's suggestions (English only)."""
     # If the language is English, use the Merriam-Webster API.
     # Otherwise, use WordReference.
     if language == 'en':
@@ -14,7 +16,7 @@ def lookup_term(language, term):
         except WordNotFoundException as e:
             # If the word can't be found, use the suggestions as the
             # definition.
-            return str(e)
+            return str(e), False
 
         definitions = [
             u'({function}) {d}'.format(function=entry.function, d=d)
@@ -23,10 +25,12 @@ def lookup_term(language, term):
         ]
     else:
         results = translate_word('{}en'.format(language), term)
+        if results == -1:
+            return '', False
+
         definitions = []
-        if results != -1:
-            for row in results:
-                # Replace linebreaks with semicolons.
-                definitions.append(row[1].replace(' \n', '; ').strip())
+        for row in results:
+            # Replace linebreaks with semicolons.
+            definitions.append(row[1].replace(' \n', '; ').strip())
 
-    return ' / '.join(definitions)
+    return ' / '.join(definitions), True
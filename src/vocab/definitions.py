@@ -0,0 +1,143 @@
+"""Dictionary lookups for get_definition, remembered in the database.
+
+A definition is looked up again once it's older than TTL. Terms that the
+dictionary doesn't have are remembered too, for NOT_FOUND_TTL, so retyping
+a misspelled term doesn't hit the API every time. Terms too long for
+Definition.text (e.g., a whole selected sentence) are looked up every time.
+
+prefetch looks up many terms at once, with a thread pool (only the API calls
+happen in the threads; the results are saved afterwards).
+
+aget_definition is the version for async views. The dictionary clients are
+synchronous, so the lookup runs in a worker thread, and is given up on after
+LOOKUP_TIMEOUT seconds (the thread finishes on its own, and its result is
+thrown away). Only under ASGI does that free the worker: under WSGI, Django
+runs the view with async_to_sync, which waits for the thread anyway.
+"""
+import asyncio
+import concurrent.futures
+import datetime
+import logging
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from vocab import api
+from vocab.models import Definition
+
+
+TTL = datetime.timedelta(days=90)
+NOT_FOUND_TTL = datetime.timedelta(days=7)
+MAX_WORKERS = 8
+LOOKUP_TIMEOUT = 10  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+def _is_fresh(definition, now):
+    ttl = TTL if definition.found else NOT_FOUND_TTL
+    return now - definition.fetched_at <= ttl
+
+
+def _can_remember(text):
+    return len(text) <= Definition._meta.get_field('text').max_length
+
+
+def _get_remembered(language, text):
+    return Definition.objects.filter(language=language, text=text)
+
+
+def _get_fresh(definition):
+    """Takes a Definition or None."""
+    if definition is not None and _is_fresh(definition, timezone.now()):
+        return definition
+
+
+def _get_defaults(definition, found):
+    return {
+        'definition': definition,
+        'found': found,
+        'fetched_at': timezone.now(),
+    }
+
+
+def _save(language, text, definition, found):
+    return Definition.objects.update_or_create(
+        language=language, text=text,
+        defaults=_get_defaults(definition, found),
+    )[0]
+
+
+def get_cached(language, text):
+    """Returns the remembered Definition, or None if there isn't a fresh
+    one."""
+    if _can_remember(text):
+        return _get_fresh(_get_remembered(language, text).first())
+
+
+def get_definition(language, text):
+    """Returns the definition (or the suggestions, if the term wasn't
+    found), looking it up only if it isn't remembered."""
+    cached = get_cached(language, text)
+    if cached is not None:
+        return cached.definition
+
+    definition, found = api.lookup_term(language, text)
+    if _can_remember(text):
+        _save(language, text, definition, found)
+    return definition
+
+
+async def aget_definition(language, text):
+    """Like get_definition, but raises TimeoutError if the dictionary takes
+    longer than LOOKUP_TIMEOUT to answer."""
+    if _can_remember(text):
+        cached = _get_fresh(await _get_remembered(language, text).afirst())
+        if cached is not None:
+            return cached.definition
+
+    lookup = sync_to_async(api.lookup_term, thread_sensitive=False)
+    definition, found = await asyncio.wait_for(
+        lookup(language, text), LOOKUP_TIMEOUT
+    )
+    if _can_remember(text):
+        await Definition.objects.aupdate_or_create(
+            language=language, text=text,
+            defaults=_get_defaults(definition, found),
+        )
+    return definition
+
+
+def prefetch(language, texts, max_workers=MAX_WORKERS):
+    """Looks up the terms that aren't remembered yet (and aren't too long to
+    be), max_workers at a time. Returns a dict with the number of terms that
+    were already cached, found, not found, and that failed (e.g., because of
+    a network error)."""
+    texts = set(text for text in texts if _can_remember(text))
+    now = timezone.now()
+    cached = set(
+        definition.text
+        for definition in Definition.objects.filter(
+            language=language, text__in=texts
+        )
+        if _is_fresh(definition, now)
+    )
+    missing = sorted(texts - cached)
+
+    counts = {'cached': len(cached), 'found': 0, 'not_found': 0, 'failed': 0}
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futures = {
+            executor.submit(api.lookup_term, language, text): text
+            for text in missing
+        }
+        for future in concurrent.futures.as_completed(futures):
+            text = futures[future]
+            try:
+                definition, found = future.result()
+            except Exception:
+                logger.exception('Could not look up %s', text)
+                counts['failed'] += 1
+                continue
+            _save(language, text, definition, found)
+            counts['found' if found else 'not_found'] += 1
+    return counts
@@ -96,7 +96,7 @@ class TermOccurrenceForm(forms.ModelForm, SectionChoiceForm, PageNumberForm):
         if section:
             occurrence.section = section
         else:
-            occurrence.section = occurrence.determine_section()
+            occurrence.section_id = occurrence.determine_section_id()
 
         occurrence.save()
         self.save_m2m()
@@ -0,0 +1,75 @@
+"""Highlights the term within the quote of each TermOccurrence.
+
+The patterns are compiled once per distinct Term.highlights value, and the
+rendered HTML is remembered per occurrence (along with the quote and
+highlights it was rendered from, so an edited term never gets stale HTML).
+The signal handlers drop an occurrence's HTML when it's saved or deleted.
+"""
+import collections
+import functools
+import re
+import threading
+
+from books import rendering
+
+
+# Only this many rendered quotes are kept in memory at once.
+MAX_QUOTES = 2000
+
+_rendered = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize(quote):
+    """The form of the quote that the highlights are looked for in."""
+    quote = quote.lower()
+    quote = quote.replace('-', ' ').replace('"', '')
+    return quote.replace("' ", ' ').replace(" '", ' ')
+
+
+@functools.lru_cache(maxsize=1024)
+def get_patterns(highlights):
+    """Returns a tuple of (highlight, compiled pattern) pairs. The spaces in
+    each highlight also match hyphens and quotes."""
+    return tuple(
+        (h, re.compile(
+            '(' + h.replace(' ', '[-" \']*') + ')', flags=re.I | re.UNICODE
+        ))
+        for h in highlights.splitlines()
+    )
+
+
+def highlight(quote, highlights):
+    """Wraps the first highlight found in the quote (if any) in a span and
+    renders the result as Markdown."""
+    quote_search = normalize(quote)
+    for h, pattern in get_patterns(highlights):
+        if h in quote_search:
+            quote = pattern.sub(r'<span class="highlight">\1</span>', quote)
+
+            # Only need to highlight on one term.
+            break
+
+    return rendering.convert(quote)
+
+
+def get_highlighted_quote(occurrence):
+    key = (occurrence.quote, occurrence.term.highlights)
+    with _lock:
+        cached = _rendered.get(occurrence.pk)
+        if cached is not None and cached[0] == key:
+            _rendered.move_to_end(occurrence.pk)
+            return cached[1]
+
+    html = highlight(*key)
+    if occurrence.pk is not None:
+        with _lock:
+            _rendered[occurrence.pk] = (key, html)
+            while len(_rendered) > MAX_QUOTES:
+                _rendered.popitem(last=False)
+    return html
+
+
+def invalidate(occurrence_id):
+    with _lock:
+        _rendered.pop(occurrence_id, None)
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vocab import definitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Looks up the definitions of many terms at once (concurrently), so '
+        'that get_definition returns them straight away later on.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='*')
+        parser.add_argument(
+            '--file',
+            help='File with one term per line (- for stdin)',
+        )
+        parser.add_argument('--language', default='en')
+        parser.add_argument('--workers', type=int,
+                            default=definitions.MAX_WORKERS)
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        terms = list(options['terms'])
+        if options['file'] == '-':
+            terms.extend(sys.stdin.read().splitlines())
+        elif options['file']:
+            with open(options['file']) as f:
+                terms.extend(f.read().splitlines())
+        terms = [term.strip() for term in terms if term.strip()]
+        if not terms:
+            raise CommandError('No terms given')
+
+        counts = definitions.prefetch(
+            options['language'], terms, options['workers']
+        )
+        self.stdout.write(
+            '{cached} cached, {found} found, {not_found} not found, '
+            '{failed} failed'.format(**counts)
+        )
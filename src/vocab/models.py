@@ -1,13 +1,15 @@
 from __future__ import unicode_literals
-import re
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from languages.fields import LanguageField
-import markdown
 
 from books.models import Book, Author, Section, SectionArtefact
+from vocab import highlighting
 
 
 class TermCategory(models.Model):
@@ -29,9 +31,14 @@ class Term(models.Model):
     language = LanguageField(default='en')
     highlights = models.TextField()  # words to highlight, separated by \n
     flagged = models.BooleanField(default=False)  # pretty words
+    # Only populated on Postgres (see books/fulltext.py)
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['text']
+        indexes = [
+            models.Index(Lower('text'), F('id'), name='term_lower_text_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -43,6 +50,26 @@ class Term(models.Model):
         return self.highlights.splitlines()
 
 
+class Definition(models.Model):
+    """A dictionary lookup, remembered for a while (see definitions.py)."""
+    language = LanguageField(default='en')
+    text = models.CharField(max_length=100)
+    definition = models.TextField()
+    # False if the dictionary didn't have the term (the definition is then
+    # its suggestions, if any).
+    found = models.BooleanField(default=True)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['language', 'text'],
+                                    name='definition_language_text_unique'),
+        ]
+
+    def __str__(self):
+        return self.text
+
+
 class TermOccurrence(SectionArtefact):
     term = models.ForeignKey(Term, on_delete=models.CASCADE,
         related_name='occurrences')
@@ -59,9 +86,14 @@ class TermOccurrence(SectionArtefact):
     # Should only be empty if the original author isn't in our database.
     # Will usually inherit from the Section, if present, or the book.
     authors = models.ManyToManyField(Author, blank=True, related_name='terms')
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['-in_preface', 'page_number']
+        indexes = [
+            models.Index(fields=['book', 'in_preface', 'page_number'],
+                         name='occurrence_book_page_idx'),
+        ]
 
     @property
     def display_template(self):
@@ -77,19 +109,4 @@ class TermOccurrence(SectionArtefact):
         )
 
     def get_highlighted_quote(self):
-        q = self.quote
-        # For more efficient searching.
-        q_search = self.quote.lower()
-        q_search = q_search.replace('-', ' ').replace('"', '')
-        q_search = q_search.replace("' ", ' ').replace(" '", ' ')
-        highlights = self.term.highlights.splitlines()
-        for h in highlights:
-            if h in q_search:
-                h = h.replace(' ', '[-" \']*')
-                q = re.sub('(' + h + ')', r'<span class="highlight">\1</span>', q,
-                           flags=re.I | re.UNICODE)
-
-                # Only need to highlight on one term.
-                break
-
-        return markdown.markdown(q, smart_emphasis=False)
+        return highlighting.get_highlighted_quote(self)